@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+from time import time
+
+# Job rows older than this are dropped when new jobs are created
+JOB_RETENTION_SECONDS = 24 * 3600
+
+
+class AsyncJobs:
+    """
+    Status (queued, running, done or failed) of background render jobs, in a
+    SQLite file shared by all gunicorn workers so a job started by one worker
+    can be polled through another.
+
+    A job id is the result cache key of the response it produces, so
+    submitting the same render twice yields the same job, and a finished
+    job's result is read straight from the result cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                config_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, job_id):
+        row = self._connect().execute(
+            "SELECT job_id, kind, config_id, status, error, created_at, updated_at FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("job_id", "kind", "config_id", "status", "error", "created_at", "updated_at")
+        return dict(zip(keys, row))
+
+    def claim(self, job_id, kind, config_id, status, stale_after):
+        """
+        Create or restart the job unless it is already queued or running
+        (and updated within `stale_after` seconds). Returns True if the
+        caller should run it.
+        """
+        conn = self._connect()
+        now = time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - JOB_RETENTION_SECONDS,))
+            job = conn.execute("SELECT status, updated_at FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            active = job is not None and job[0] in ("queued", "running") and now - job[1] < stale_after
+            if not active:
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (job_id, kind, config_id, status, error, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, NULL, ?, ?)",
+                    (job_id, kind, config_id, status, now, now),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return not active and status != "done"
+
+    def update(self, job_id, status, error=None):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+            (status, error, time(), job_id),
+        )
@@ -0,0 +1,340 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import xgstels
+except ImportError:
+    import xgstels
+
+# Percentiles reported for every benchmark
+RESULT_FIELDS = ("p50", "p90", "p99")
+
+# Phases of generate_plot/generate_grid_plot, from the metrics spans
+PLOT_PHASES = ("get_boundary", "b_mag", "matplotlib", "json")
+
+
+def synthetic_rows(rows, seed, second_order_fraction):
+    """
+    XGStels-like rows: random axis shapes and etabar, with the first-order
+    diagnostics computed by near_axis_batch so filters select realistic
+    fractions of the table.
+    """
+    try:
+        from . import near_axis_batch
+    except ImportError:
+        import near_axis_batch
+
+    rng = np.random.default_rng(seed)
+    rc1 = rng.uniform(0.02, 0.1, rows)
+    df = pd.DataFrame({
+        "rc1": rc1,
+        "rc2": rng.uniform(-0.003, 0.003, rows),
+        "rc3": np.zeros(rows),
+        "zs1": -rc1 * rng.uniform(0.9, 1.1, rows),
+        "zs2": rng.uniform(-0.003, 0.003, rows),
+        "zs3": np.zeros(rows),
+        "nfp": rng.integers(1, 6, rows),
+        "etabar": rng.uniform(-1.2, -0.6, rows),
+        "B2c": np.where(rng.random(rows) < second_order_fraction, rng.uniform(-2, 2, rows), np.nan),
+        "p2": np.zeros(rows),
+    })
+    configs = [
+        (i + 1, r.rc1, r.rc2, r.rc3, r.zs1, r.zs2, r.zs3, int(r.nfp), r.etabar, None, r.p2, None, None)
+        for i, r in enumerate(df.itertuples())
+    ]
+    diagnostics = near_axis_batch.evaluate_rows(configs, 71)
+    for field in ("axis_length", "iota", "max_elongation", "min_L_grad_B", "min_R0"):
+        df[field] = [diagnostics[config[0]][field] for config in configs]
+    df["r_singularity"] = rng.uniform(0.05, 0.5, rows)
+    df["L_grad_grad_B"] = rng.uniform(0.1, 1.0, rows)
+    df["B20_variation"] = rng.lognormal(0, 1, rows)
+    df["beta"] = rng.uniform(-0.05, 0.05, rows)
+    df["DMerc_times_r2"] = rng.normal(0, 10, rows)
+    return df
+
+
+def sampled_rows(source, rows, seed):
+    """A seeded random sample of the rows of an existing database"""
+    conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    ids = [row[0] for row in conn.execute(f"SELECT id FROM {xgstels.table_name}")]
+    rng = np.random.default_rng(seed)
+    chosen = sorted(rng.choice(ids, size=min(rows, len(ids)), replace=False).tolist())
+    columns = [
+        row[1] for row in conn.execute(f"PRAGMA table_info({xgstels.table_name})")
+        if row[1] not in ("id", "sample_rank")
+    ]
+    df = pd.concat([
+        pd.read_sql(
+            f"SELECT {', '.join(columns)} FROM {xgstels.table_name} WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id",
+            conn, params=chunk,
+        )
+        for chunk in (chosen[i:i + 500] for i in range(0, len(chosen), 500))
+    ])
+    conn.close()
+    return df
+
+
+def build_database(path, df):
+    """Write rows to a new database with the same indexes and statistics as xgstels.py"""
+    conn = sqlite3.connect(path)
+    xgstels.create_table(conn, df)
+    xgstels.create_sample_ranks(conn)
+    xgstels.create_indexes(conn)
+    xgstels.create_stats(conn)
+    conn.commit()
+    conn.close()
+
+
+def summarize(samples, sizes=None):
+    values = np.array(samples, dtype=float)
+    result = {
+        "n": len(values),
+        "mean": float(values.mean()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+    }
+    for field, q in zip(RESULT_FIELDS, (50, 90, 99)):
+        result[field] = float(np.percentile(values, q))
+    if sizes:
+        result["bytes"] = {"p50": float(np.percentile(sizes, 50)), "max": int(max(sizes))}
+    return result
+
+
+def filter_mixes(conn):
+    """
+    Representative /api/configs query strings: slider ranges between
+    quantiles of the actual data, searches, sorting and deep pages.
+    """
+    quantiles = {
+        column: json.loads(text)
+        for column, text in conn.execute(
+            f"SELECT column_name, quantiles FROM {xgstels.stats_table_name} WHERE quantiles IS NOT NULL"
+        )
+    }
+
+    def between(column, low, high):
+        return f"{column}_min={quantiles[column][low]:.6g}&{column}_max={quantiles[column][high]:.6g}"
+
+    median_etabar = f"{abs(quantiles['etabar']['0.5']):.1f}"
+    return {
+        "unfiltered": "page=1",
+        "nfp": "search_nfp=3",
+        "slider_narrow": between("iota", "0.25", "0.5"),
+        "slider_multi": between("iota", "0.1", "0.9") + "&" + between("etabar", "0.25", "0.75") + "&" + between("rc1", "0.05", "0.95"),
+        "slider_sorted": between("r_singularity", "0.5", "1.0") + "&sort_field=beta&sort_order=desc",
+        "search_prefix": f"search_etabar=-{median_etabar}",
+        "search_like": f"search_mode=like&search_etabar={median_etabar}",
+        "deep_page": "page=40&limit=100&sort_field=iota",
+        "cursor": "pagination=cursor&count=none&sort_field=min_L_grad_B&limit=100",
+    }
+
+
+def time_configs(routes, conn, repeats, results):
+    client = routes.app.test_client()
+    backends = {"sqlite": None}
+    if routes.column_store is not None:
+        backends["column_store"] = routes.column_store
+    saved = routes.column_store
+    try:
+        for backend, store in backends.items():
+            routes.column_store = store
+            for name, query in filter_mixes(conn).items():
+                samples, sizes = [], []
+                for _ in range(repeats + 1):
+                    # Every slider position is a new query; do not time the count cache
+                    routes.count_configs.cache_clear()
+                    start = time.perf_counter()
+                    response = client.get(f"/api/configs?{query}")
+                    body = response.get_data()
+                    samples.append(time.perf_counter() - start)
+                    sizes.append(len(body))
+                    if response.status_code != 200:
+                        raise RuntimeError(f"/api/configs?{query} returned {response.status_code}")
+                # The first request of each mix warms up the page cache
+                results[f"get_configs[{backend}:{name}]"] = summarize(samples[1:], sizes[1:])
+                print(f"get_configs[{backend}:{name}]: p50 {results[f'get_configs[{backend}:{name}]']['p50'] * 1000:.1f} ms")
+    finally:
+        routes.column_store = saved
+
+
+def time_renders(routes, configs, warmup, static, results):
+    samples = {}
+    sizes = {}
+
+    def record(name, seconds, size=None):
+        samples.setdefault(name, []).append(seconds)
+        if size is not None:
+            sizes.setdefault(name, []).append(size)
+
+    for index, config in enumerate(configs):
+        measured = index >= warmup
+        start = time.perf_counter()
+        stel = routes.get_stel_from_config(config)
+        qsc_seconds = time.perf_counter() - start
+
+        routes.metrics.start_request()
+        start = time.perf_counter()
+        body = routes.plot_response_body(routes.generate_plot(stel, config, static=static))
+        plot_seconds = time.perf_counter() - start
+        plot_spans = routes.metrics.finish_request()
+
+        routes.metrics.start_request()
+        start = time.perf_counter()
+        grid_body = routes.plot_response_body(routes.generate_grid_plot(stel))
+        grid_seconds = time.perf_counter() - start
+        grid_spans = routes.metrics.finish_request()
+
+        print(f"[{index + 1}/{len(configs)}] config {config[0]}{'' if measured else ' (warm-up)'}: "
+              f"Qsc {qsc_seconds:.2f} s, plot {plot_seconds:.2f} s, grid {grid_seconds:.2f} s")
+        if not measured:
+            continue
+        record("get_stel_from_config", qsc_seconds)
+        record("generate_plot", plot_seconds, len(body))
+        for phase in PLOT_PHASES:
+            record(f"generate_plot.{phase}", sum(seconds for name, seconds in plot_spans if name == phase))
+        record("generate_grid_plot", grid_seconds, len(grid_body))
+        record("generate_grid_plot.json", sum(seconds for name, seconds in grid_spans if name == "json"))
+
+    for name, values in samples.items():
+        results[name] = summarize(values, sizes.get(name))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous_path, threshold):
+    """Print p50/p90 changes against an earlier run; returns the names that regressed"""
+    with open(previous_path) as f:
+        previous = json.load(f)
+    regressions = []
+    print(f"\nCompared with {previous_path} ({previous['meta'].get('commit') or 'unknown commit'}):")
+    for name, result in results.items():
+        old = previous["results"].get(name)
+        if old is None:
+            continue
+        change = result["p50"] / old["p50"] - 1 if old["p50"] else 0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name}: p50 {old['p50'] * 1000:.1f} -> {result['p50'] * 1000:.1f} ms ({change:+.0%}), "
+              f"p90 {old['p90'] * 1000:.1f} -> {result['p90'] * 1000:.1f} ms{flag}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time the backend hot paths against a synthetic or sampled database")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--synthetic", type=int, default=5000, metavar="ROWS",
+                        help="Generate a synthetic database with this many rows (default)")
+    source.add_argument("--sample-from", metavar="DB",
+                        help="Sample --rows rows of an existing XGStels database instead")
+    parser.add_argument("--rows", type=int, default=5000,
+                        help="Rows to sample with --sample-from")
+    parser.add_argument("--second-order-fraction", type=float, default=0.0,
+                        help="Fraction of synthetic rows with B2c set (rendered at higher order)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for the data and for the configurations that are rendered")
+    parser.add_argument("--configs", type=int, default=20,
+                        help="Configurations to render (after the warm-up ones)")
+    parser.add_argument("--warmup", type=int, default=2,
+                        help="Configurations rendered first and not measured")
+    parser.add_argument("--static", default="inline",
+                        help="static mode passed to generate_plot (inline includes the matplotlib phase)")
+    parser.add_argument("--query-repeats", type=int, default=20,
+                        help="Measured /api/configs requests per filter mix and backend")
+    parser.add_argument("--skip-renders", action="store_true",
+                        help="Only time the /api/configs queries")
+    parser.add_argument("--workdir",
+                        help="Directory for the database and caches (default: a new temporary directory)")
+    parser.add_argument("--output", default="benchmark.json",
+                        help="Where to write the results (JSON)")
+    parser.add_argument("--compare", metavar="JSON",
+                        help="Earlier results to compare with; exits with status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="p50 slowdown reported as a regression by --compare (default: 10%%)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="stellarator-benchmark-")
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, "XGStels.db")
+
+    start = time.time()
+    if args.sample_from:
+        df = sampled_rows(args.sample_from, args.rows, args.seed)
+    else:
+        df = synthetic_rows(args.synthetic, args.seed, args.second_order_fraction)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    build_database(db_path, df)
+    print(f"Built {db_path} with {len(df)} rows in {time.time() - start:.1f} seconds")
+
+    # Fresh caches in the work directory, so every run measures the same
+    # cold paths; renders run inline so their phases can be timed
+    os.environ["STELLARATOR_DB"] = db_path
+    os.environ["STELLARATOR_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["STELLARATOR_PRECOMPUTED_DIR"] = os.path.join(workdir, "precomputed")
+    os.environ["STELLARATOR_SNAPSHOT_DIR"] = os.path.join(workdir, "snapshot")
+    os.environ["STELLARATOR_COMPUTE_POOL"] = "0"
+    os.environ["STELLARATOR_WARMUP"] = "0"
+    try:
+        from . import routes
+    except ImportError:
+        import routes
+    if args.static not in routes.STATIC_MODES:
+        sys.exit(f"--static must be one of {', '.join(routes.STATIC_MODES)}")
+
+    results = {}
+    conn = sqlite3.connect(db_path)
+    time_configs(routes, conn, args.query_repeats, results)
+
+    if not args.skip_renders:
+        rng = np.random.default_rng(args.seed)
+        configs = routes.fetch_configs()
+        chosen = rng.choice(len(configs), size=min(args.configs + args.warmup, len(configs)), replace=False)
+        time_renders(routes, [configs[i] for i in chosen], args.warmup, args.static, results)
+    conn.close()
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "qsc": routes.Qsc.__module__,
+            "rows": len(df),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
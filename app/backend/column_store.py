@@ -0,0 +1,193 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+try:
+    from .config_query import CONFIG_COLUMNS, SORT_FIELDS
+except ImportError:
+    from config_query import CONFIG_COLUMNS, SORT_FIELDS
+
+# Bump when the snapshot layout changes
+SNAPSHOT_VERSION = 2
+
+# Every column served by /api/configs, /api/ranges and /api/scatter
+STORE_COLUMNS = CONFIG_COLUMNS
+
+# Columns added by later versions of xgstels.py; stored when the database has them
+OPTIONAL_COLUMNS = ["sample_rank"]
+
+# Columns returned as integers; everything else is float64 with NaN for NULL
+INTEGER_COLUMNS = {"id", "nfp"}
+
+
+def db_signature(db_path):
+    stat = os.stat(db_path)
+    return {"version": SNAPSHOT_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class ColumnStore:
+    """
+    Read-only columnar copy of the XGStels table: one NumPy array per column,
+    plus a precomputed sort permutation per sortable column.
+
+    The arrays are saved as .npy files and memory-mapped, so all gunicorn
+    workers on a machine share the same pages. Filters are evaluated as
+    vectorized boolean masks over the predicates from config_query.py.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.columns = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in STORE_COLUMNS
+        }
+        for name in OPTIONAL_COLUMNS:
+            path = os.path.join(directory, f"{name}.npy")
+            if os.path.exists(path):
+                self.columns[name] = np.load(path, mmap_mode="r")
+        self.sort_orders = {
+            name: np.load(os.path.join(directory, f"order_{name}.npy"), mmap_mode="r")
+            for name in SORT_FIELDS
+        }
+        self.size = len(self.columns["id"])
+
+    @classmethod
+    def open(cls, db_path, directory):
+        """Load the snapshot in `directory`, rebuilding it if the database changed"""
+        signature = db_signature(db_path)
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                if json.load(f) == signature:
+                    return cls(directory)
+        except (OSError, ValueError):
+            pass
+        cls.build(db_path, directory, signature)
+        return cls(directory)
+
+    @classmethod
+    def build(cls, db_path, directory, signature):
+        # Imported here so the store can be built without the web app
+        import sqlite3
+
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        available = {row[1] for row in conn.execute("PRAGMA table_info(XGStels)")}
+        names = STORE_COLUMNS + [name for name in OPTIONAL_COLUMNS if name in available]
+        rows = conn.execute(f"SELECT {', '.join(names)} FROM XGStels ORDER BY id").fetchall()
+        conn.close()
+
+        # Build next to the target and swap it in with a rename, so workers
+        # starting at the same time never see a half-written snapshot
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".snapshot-")
+        data = list(zip(*rows)) if rows else [()] * len(names)
+        ids = np.array(data[0], dtype=np.int64)
+        index_dtype = np.int32 if len(ids) < 2**31 else np.int64
+        for name, values in zip(names, data):
+            if name == "id":
+                array = ids
+            else:
+                array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+            if name in SORT_FIELDS:
+                # Ascending (value, id) with NULLs first, as SQLite sorts them
+                keys = np.where(np.isnan(array), -np.inf, array) if name != "id" else array
+                order = np.lexsort((ids, keys)).astype(index_dtype)
+                np.save(os.path.join(tmp_dir, f"order_{name}.npy"), order)
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(signature, f)
+
+        old_dir = None
+        if os.path.exists(directory):
+            old_dir = tempfile.mkdtemp(dir=parent, prefix=".snapshot-old-")
+            os.rmdir(old_dir)
+            try:
+                os.rename(directory, old_dir)
+            except OSError:
+                old_dir = None
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # Another worker won the race; its snapshot is just as good
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+        print(f"Built column store snapshot with {len(ids)} rows in {directory}")
+
+    def predicate_mask(self, predicate):
+        kind = predicate[0]
+        if kind == "range":
+            _, column, low, high, low_inclusive, high_inclusive = predicate
+            values = self.columns[column]
+            mask = np.ones(self.size, dtype=bool)
+            if low is not None:
+                mask &= (values >= low) if low_inclusive else (values > low)
+            if high is not None:
+                mask &= (values <= high) if high_inclusive else (values < high)
+            return mask
+        if kind == "any":
+            mask = np.zeros(self.size, dtype=bool)
+            for p in predicate[1]:
+                mask |= self.predicate_mask(p)
+            return mask
+        if kind == "none":
+            return np.zeros(self.size, dtype=bool)
+        if kind == "keyset":
+            _, sort_field, sort_order, value, last_id = predicate
+            ids = self.columns["id"]
+            if sort_field == "id":
+                return ids > last_id if sort_order == "asc" else ids < last_id
+            values = self.columns[sort_field]
+            is_null = np.isnan(values)
+            if sort_order == "asc":
+                if value is None:
+                    return (is_null & (ids > last_id)) | ~is_null
+                return (values > value) | ((values == value) & (ids > last_id))
+            if value is None:
+                return is_null & (ids < last_id)
+            return (values < value) | ((values == value) & (ids < last_id)) | is_null
+        raise ValueError(f"Unsupported predicate {kind}")
+
+    def supports(self, predicates):
+        """LIKE searches depend on SQLite's text rendering of REALs, so they stay in SQL"""
+        def ok(predicate):
+            if predicate[0] == "any":
+                return all(ok(p) for p in predicate[1])
+            return predicate[0] in ("range", "none", "keyset")
+        return all(ok(p) for p in predicates)
+
+    def mask(self, predicates):
+        mask = np.ones(self.size, dtype=bool)
+        for predicate in predicates:
+            mask &= self.predicate_mask(predicate)
+        return mask
+
+    def select(self, mask, sort_field="id", sort_order="asc", offset=0, limit=None):
+        """Row positions matching `mask`, sorted by (sort_field, id)"""
+        order = self.sort_orders[sort_field]
+        selected = order[mask[order]]
+        if sort_order == "desc":
+            selected = selected[::-1]
+        end = None if limit is None else offset + limit
+        return selected[offset:end]
+
+    def rows(self, positions, columns=STORE_COLUMNS):
+        """Rows at `positions` as tuples of Python values (None for NULL)"""
+        out = []
+        for name in columns:
+            values = np.asarray(self.columns[name][positions])
+            if name == "id":
+                out.append(values.tolist())
+            elif name in INTEGER_COLUMNS:
+                out.append([None if np.isnan(v) else int(v) for v in values])
+            else:
+                out.append([None if v != v else v for v in values.tolist()])
+        return list(zip(*out))
+
+    def min_max(self, column):
+        values = self.columns[column]
+        if np.isnan(values).all():
+            return None, None
+        return float(np.nanmin(values)), float(np.nanmax(values))
@@ -0,0 +1,98 @@
+import gzip
+import os
+
+try:
+    from .result_cache import write_atomic
+except ImportError:
+    from result_cache import write_atomic
+
+# Brotli and zstd are used when their modules are installed; gzip always works
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content codings in order of preference
+ENCODINGS = [encoding for encoding, available in (("br", brotli), ("zstd", zstandard), ("gzip", gzip)) if available]
+
+# File name suffixes of precompressed variants
+SUFFIXES = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+
+# Smaller bodies are sent as they are
+MIN_SIZE = 1024
+
+# Levels for bodies compressed on every request: the larger the body, the
+# cheaper the level, so compression never dominates the response time
+DYNAMIC_LEVELS = [
+    (64 * 1024, {"br": 6, "zstd": 9, "gzip": 6}),
+    (1024 * 1024, {"br": 5, "zstd": 6, "gzip": 5}),
+    (None, {"br": 4, "zstd": 3, "gzip": 4}),
+]
+
+# Levels for variants that are compressed once and stored, by the
+# precompute step (store_variants), off the request path
+STORED_LEVELS = {"br": 9, "zstd": 19, "gzip": 9}
+
+# Levels for variants built by the first request that needs them
+CACHED_LEVELS = {"br": 5, "zstd": 6, "gzip": 6}
+
+
+def negotiate(accept_encodings, size):
+    """
+    The preferred encoding the client accepts (werkzeug's
+    request.accept_encodings), or None to send the body uncompressed
+    """
+    if size < MIN_SIZE:
+        return None
+    for encoding in ENCODINGS:
+        if accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def dynamic_level(encoding, size):
+    for limit, levels in DYNAMIC_LEVELS:
+        if limit is None or size <= limit:
+            return levels[encoding]
+
+
+def compress(data, encoding, level):
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and so stored variants) reproducible
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unknown encoding {encoding}")
+
+
+def precompressed_file(path, encoding):
+    """
+    Path of the `encoding` variant stored next to the file at `path`,
+    written on first use and rewritten when the file is newer than it
+    """
+    variant = path + SUFFIXES[encoding]
+    try:
+        if os.path.getmtime(variant) >= os.path.getmtime(path):
+            return variant
+    except FileNotFoundError:
+        pass
+    with open(path, "rb") as f:
+        data = f.read()
+    write_atomic(variant, compress(data, encoding, CACHED_LEVELS[encoding]))
+    return variant
+
+
+def store_variants(path):
+    """Write every variant of the file at `path` at the stored levels"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < MIN_SIZE:
+        return
+    for encoding in ENCODINGS:
+        write_atomic(path + SUFFIXES[encoding], compress(data, encoding, STORED_LEVELS[encoding]))
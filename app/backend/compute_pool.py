@@ -0,0 +1,270 @@
+import math
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from time import time
+
+try:
+    from .worker_process import TaskTimeout, init_worker, spawn_context
+except ImportError:
+    from worker_process import TaskTimeout, init_worker, spawn_context
+
+
+class PoolSaturated(Exception):
+    """Too many jobs are queued; the client should retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Compute pool saturated, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class PoolRestarted(PoolSaturated):
+    """The job was lost with a compute process that died or was killed; retry it"""
+
+
+class JobTimeout(Exception):
+    pass
+
+
+def _routes():
+    # Imported in the compute process, not when this module is loaded
+    try:
+        from . import routes
+    except ImportError:
+        import routes
+    return routes
+
+
+def _init_compute_process():
+    """Pool initializer: timeouts, then the warm-up of the render code paths"""
+    init_worker()
+    if os.environ.get("STELLARATOR_WARMUP", "1") != "0":
+        _routes().warm_up(batch=False)
+
+
+def _ready():
+    """No-op task submitted by ComputePool.start"""
+    return os.getpid(), _routes().warmup_timings["total"]
+
+
+def _run_task(task, args, timeout):
+    """
+    Runs in a compute process: routes.<task>(*args) under a SIGALRM budget.
+    Returns (result, timing spans), or None if the budget ran out.
+    """
+    routes = _routes()
+    routes.metrics.start_request()
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = getattr(routes, task)(*args)
+    except TaskTimeout:
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        spans = routes.metrics.finish_request()
+        # Compute processes are not scraped; publish their spans right away
+        routes.metrics.flush()
+    return result, spans
+
+
+class ComputePool:
+    """
+    Bounded pool of compute processes for Qsc construction and rendering,
+    separate from the WSGI request threads.
+
+    At most `max_pending` jobs (running plus queued) are accepted; beyond
+    that submit raises PoolSaturated with a Retry-After estimate taken from
+    recent job durations. Each job gets `timeout` seconds, enforced with
+    SIGALRM inside the compute process. A job that still does not return
+    (stuck in native code) is given up on after a grace period: the compute
+    processes are killed and the executor replaced, so the pool does not
+    stay full. Jobs lost with a killed or crashed process raise
+    PoolRestarted from wait().
+
+    The executor is created on first use in each process, so gunicorn
+    workers forked from a preloaded app each get their own; after start(),
+    every new executor starts its compute processes right away, so they
+    import routes and warm up before the first job instead of during it.
+    Timing spans measured in the compute process are passed to `span_sink`
+    by wait().
+    """
+
+    # Extra wait before a job whose SIGALRM was lost (e.g. raised inside a
+    # callback that swallows exceptions) is given up on
+    GRACE_SECONDS = 5
+
+    def __init__(self, workers, max_pending, timeout, span_sink=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.span_sink = span_sink
+        # Reentrant: a done callback runs in the submitting thread if the
+        # future has already finished
+        self._lock = threading.RLock()
+        self._executor = None
+        self._pid = None
+        self._started = False
+        # Jobs of the current executor that have not finished yet
+        self._futures = set()
+        self._rejected = 0
+        self._timeouts = 0
+        self._restarts = 0
+        self._completed = 0
+        self._average_seconds = None
+        self._warmup_seconds = {}
+
+    def _get_executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=spawn_context(), initializer=_init_compute_process
+            )
+            self._pid = os.getpid()
+            self._futures = set()
+            if self._started:
+                self._start_processes(self._executor)
+        return self._executor
+
+    def _start_processes(self, executor):
+        """
+        One no-op task per compute process, so they all start now; does not
+        wait for them. A process still warming up leaves its task to one
+        that is ready, so fewer than `workers` may report back.
+        """
+        start_time = time()
+
+        def ready(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            pid, warmup_seconds = future.result()
+            with self._lock:
+                self._warmup_seconds[pid] = warmup_seconds
+            print(f"Compute process {pid} ready after {time() - start_time:.2f} seconds")
+
+        for _ in range(self.workers):
+            executor.submit(_ready).add_done_callback(ready)
+
+    def start(self):
+        """Start the compute processes now, and again whenever the executor is replaced"""
+        with self._lock:
+            self._started = True
+            self._get_executor()
+
+    def _discard(self, executor):
+        """
+        Forget `executor` if it is still the current one, together with its
+        jobs; the next submit starts a new one. Call with the lock held.
+        """
+        if self._executor is not executor:
+            return False
+        self._executor = None
+        self._futures = set()
+        self._warmup_seconds = {}
+        self._restarts += 1
+        return True
+
+    def _kill(self, future):
+        """
+        Kill the compute processes of the executor running `future`. SIGALRM
+        cannot interrupt native code, so this is the only way to get the
+        slot back; the other jobs on that executor fail with
+        BrokenProcessPool, as after a crash.
+        """
+        with self._lock:
+            if future not in self._futures:
+                return
+            executor = self._executor
+            self._discard(executor)
+        print("Killing the compute processes and restarting the compute pool")
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False)
+
+    def retry_after(self):
+        average = self._average_seconds or 5.0
+        return max(1, math.ceil(average * len(self._futures) / self.workers))
+
+    def _job_done(self, start_time, executor):
+        def done(future):
+            with self._lock:
+                if future in self._futures:
+                    self._futures.discard(future)
+                    if not future.cancelled() and future.exception() is None:
+                        self._completed += 1
+                        elapsed = time() - start_time
+                        if self._average_seconds is None:
+                            self._average_seconds = elapsed
+                        else:
+                            self._average_seconds = 0.8 * self._average_seconds + 0.2 * elapsed
+                if (not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)
+                        and self._discard(executor)):
+                    # A compute process died (e.g. out of memory)
+                    print("Compute pool broken, restarting it")
+        return done
+
+    def submit(self, task, *args):
+        """
+        Start routes.<task>(*args) in a compute process and return its future,
+        to be passed to wait()
+        """
+        with self._lock:
+            if len(self._futures) >= self.max_pending:
+                self._rejected += 1
+                raise PoolSaturated(self.retry_after())
+            # A job only counts towards max_pending once it is submitted, so
+            # a failed submit leaves nothing to clean up
+            executor = self._get_executor()
+            try:
+                future = executor.submit(_run_task, task, args, self.timeout)
+            except BrokenProcessPool:
+                print("Compute pool broken, restarting it")
+                self._discard(executor)
+                executor = self._get_executor()
+                try:
+                    future = executor.submit(_run_task, task, args, self.timeout)
+                except BrokenProcessPool:
+                    raise PoolRestarted(self.retry_after())
+            self._futures.add(future)
+        future.add_done_callback(self._job_done(time(), executor))
+        return future
+
+    def run(self, kind, config):
+        """Render `kind` for `config` in a compute process; returns (body, cacheable)"""
+        return self.wait(self.submit("render_body", kind, config), f"{kind} for config {config[0]}")
+
+    def wait(self, future, description):
+        """
+        Result of a submitted task; raises JobTimeout if it ran out of time,
+        or PoolRestarted if its compute process died or was killed
+        """
+        try:
+            result = future.result(timeout=self.timeout + self.GRACE_SECONDS)
+        except FutureTimeout:
+            self._kill(future)
+            result = None
+        except BrokenProcessPool:
+            raise PoolRestarted(self.retry_after())
+        if result is None:
+            with self._lock:
+                self._timeouts += 1
+            raise JobTimeout(f"{description} exceeded {self.timeout} seconds")
+        result, spans = result
+        if self.span_sink is not None:
+            self.span_sink(spans)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": len(self._futures),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "restarts": self._restarts,
+                "average_seconds": self._average_seconds,
+                "warmup_seconds": dict(self._warmup_seconds),
+            }
@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+
+try:
+    from .config_query import CONFIG_COLUMNS, ABSOLUTE_FIELDS
+except ImportError:
+    from config_query import CONFIG_COLUMNS, ABSOLUTE_FIELDS
+
+# Parquet and Arrow exports need pyarrow; CSV and NDJSON always work
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# format -> (mimetype, file extension, needs pyarrow)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv", False),
+    "ndjson": ("application/x-ndjson", "ndjson", False),
+    "parquet": ("application/vnd.apache.parquet", "parquet", True),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows", True),
+}
+
+# Rows fetched and encoded at a time; memory use is bounded by one chunk
+CHUNK_ROWS = 5000
+
+INTEGER_COLUMNS = {"id", "nfp"}
+
+
+def available_formats():
+    return [name for name, (_, _, needs_arrow) in EXPORT_FORMATS.items() if pyarrow is not None or not needs_arrow]
+
+
+def display_row(row):
+    """A row in CONFIG_COLUMNS order as /api/configs shows it (|iota|)"""
+    return tuple(
+        abs(value) if column in ABSOLUTE_FIELDS and value is not None else value
+        for column, value in zip(CONFIG_COLUMNS, row)
+    )
+
+
+def csv_chunks(row_chunks):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CONFIG_COLUMNS)
+    for rows in row_chunks:
+        writer.writerows(display_row(row) for row in rows)
+        yield output.getvalue().encode("utf-8")
+        output.seek(0)
+        output.truncate()
+    if output.tell():
+        yield output.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(row_chunks):
+    for rows in row_chunks:
+        yield "".join(json.dumps(dict(zip(CONFIG_COLUMNS, display_row(row)))) + "\n" for row in rows).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands what was written so far to the caller"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def arrow_schema():
+    return pyarrow.schema([
+        (column, pyarrow.int64() if column in INTEGER_COLUMNS else pyarrow.float64())
+        for column in CONFIG_COLUMNS
+    ])
+
+
+def arrow_chunks(row_chunks, file_format):
+    """Parquet (one row group per chunk) or Arrow IPC stream (one batch per chunk)"""
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    if file_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    for rows in row_chunks:
+        columns = list(zip(*(display_row(row) for row in rows))) or [[] for _ in CONFIG_COLUMNS]
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        ))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def export_chunks(row_chunks, file_format):
+    """Encode an iterable of row lists (CONFIG_COLUMNS order) as byte chunks"""
+    if file_format == "csv":
+        return csv_chunks(row_chunks)
+    if file_format == "ndjson":
+        return ndjson_chunks(row_chunks)
+    return arrow_chunks(row_chunks, file_format)
@@ -0,0 +1,246 @@
+import base64
+import json
+import math
+import re
+from decimal import Decimal, DecimalException
+
+# Columns accepted by the search_<column> parameters and the DataGrid filter
+SEARCH_FIELDS = [
+    "rc1", "rc2", "rc3", "zs1", "zs2", "zs3", "nfp", "etabar", "B2c", "p2",
+    "iota", "beta", "DMerc_times_r2", "min_L_grad_B", "r_singularity", "B20_variation",
+]
+
+# Columns returned by /api/configs, in SELECT order
+CONFIG_COLUMNS = [
+    "id", "rc1", "rc2", "rc3", "zs1", "zs2", "zs3", "nfp", "etabar", "B2c", "p2",
+    "iota", "beta", "DMerc_times_r2", "min_L_grad_B", "r_singularity", "B20_variation",
+]
+
+# Columns accepted by sort_field; id is always the tie-breaker
+SORT_FIELDS = ["id"] + SEARCH_FIELDS
+
+# Columns accepted by the <column>_min / <column>_max slider parameters
+RANGE_FIELDS = ["iota", "beta", "r_singularity", "etabar", "B2c", "rc1", "rc2", "zs1", "zs2"]
+
+# Columns indexed at build time (xgstels.py) so the range queries below can
+# use a B-tree instead of scanning the table
+INDEXED_FIELDS = SEARCH_FIELDS
+
+# iota is displayed as |iota|, so searches match both signs
+ABSOLUTE_FIELDS = {"iota"}
+
+# search_mode values: "range" reads the search text as a numeric prefix or
+# tolerance and uses indexed range queries; "like" keeps the previous
+# substring semantics (CAST/LIKE '%value%', full table scan)
+SEARCH_MODES = ("range", "like")
+
+_NUMBER = re.compile(r"^-?(\d+\.?\d*|\.\d+)$")
+
+
+def parse_numeric_search(text):
+    """
+    Translate a search string into a half-open numeric interval.
+
+    "0.12" matches every value whose decimal form starts with "0.12", i.e.
+    [0.12, 0.13); "-0.12" gives (-0.13, -0.12]. "0.12~0.005" matches within
+    the tolerance, [0.115, 0.125]. Returns (low, high, low_inclusive,
+    high_inclusive), or None if the text is not a plain, finite number.
+    """
+    text = text.strip()
+    try:
+        if "~" in text:
+            value, _, tolerance = text.partition("~")
+            value, tolerance = Decimal(value.strip()), abs(Decimal(tolerance.strip()))
+            interval = float(value - tolerance), float(value + tolerance), True, True
+        elif _NUMBER.match(text):
+            value = Decimal(text)
+            decimals = len(text.partition(".")[2])
+            step = Decimal(1).scaleb(-decimals)
+            if text.startswith("-"):
+                interval = float(value - step), float(value), False, True
+            else:
+                interval = float(value), float(value + step), True, False
+        else:
+            return None
+    except DecimalException:
+        # sNaN, exponents beyond the decimal context, ...
+        return None
+    if not (math.isfinite(interval[0]) and math.isfinite(interval[1])):
+        return None
+    return interval
+
+
+# Filters are parsed into predicates first, so the same request can be run
+# against SQLite (predicate_sql) or the in-memory column store
+# (column_store.predicate_mask). Predicates are tuples:
+#   ("range", column, low, high, low_inclusive, high_inclusive)  bounds may be None
+#   ("any", [predicate, ...])                                     OR of predicates
+#   ("like", column, text)                                        substring match, SQL only
+#   ("none",)                                                     matches nothing
+#   ("keyset", sort_field, sort_order, value, last_id)            rows after a cursor
+
+
+def search_predicate(column, text, mode="range"):
+    """Predicate matching `column` against a search string"""
+    interval = parse_numeric_search(text) if mode == "range" else None
+    if interval is None:
+        return ("like", column, text)
+
+    low, high, low_inclusive, high_inclusive = interval
+    predicate = ("range", column, low, high, low_inclusive, high_inclusive)
+    if column in ABSOLUTE_FIELDS:
+        # Mirror the interval onto the negative axis: two index range scans
+        mirrored = ("range", column, -high, -low, high_inclusive, low_inclusive)
+        return ("any", [predicate, mirrored])
+    return predicate
+
+
+def id_search_predicate(text, max_id, mode="range"):
+    """
+    Match ids whose decimal form starts with `text` as a union of primary key
+    ranges: "12" -> 12, 120-129, 1200-1299, ... up to max_id.
+    """
+    text = text.strip()
+    if mode != "range" or not (text.isascii() and text.isdigit()) or max_id is None:
+        return ("like", "id", text)
+    if text.startswith("0"):
+        # No id has a leading zero
+        return ("none",)
+    prefix = int(text)
+    ranges = []
+    width = 1
+    while prefix * width <= max_id:
+        ranges.append(("range", "id", prefix * width, prefix * width + width - 1, True, True))
+        width *= 10
+    if not ranges:
+        return ("none",)
+    return ("any", ranges)
+
+
+def keyset_predicate(sort_field, sort_order, value, last_id):
+    return ("keyset", sort_field, sort_order, value, last_id)
+
+
+def parse_config_filters(args, max_id=None):
+    """
+    Parse the /api/configs filter arguments (a werkzeug MultiDict) into a list
+    of predicates that must all hold.
+    """
+    mode = args.get("search_mode", default="range", type=str).lower()
+    if mode not in SEARCH_MODES:
+        mode = "range"
+
+    predicates = []
+
+    # Search by ID (prefix, or partial matching in like mode)
+    search_id = args.get("search_id", default="", type=str)
+    if search_id:
+        predicates.append(id_search_predicate(search_id, max_id, mode))
+
+    # Individual search parameters (AND logic)
+    for field in SEARCH_FIELDS:
+        value = args.get(f"search_{field}", default="", type=str)
+        if value:
+            predicates.append(search_predicate(field, value, mode))
+
+    # Range filters (min/max from sliders)
+    for field in RANGE_FIELDS:
+        low = args.get(f"{field}_min", default=None, type=float)
+        high = args.get(f"{field}_max", default=None, type=float)
+        if low is not None or high is not None:
+            predicates.append(("range", field, low, high, True, True))
+
+    # Apply the DataGrid filter
+    filter_value = args.get("filter", default="", type=str)
+    filter_field = args.get("filter_field", default="", type=str)
+    if filter_field and filter_field in SEARCH_FIELDS and filter_value:
+        predicates.append(search_predicate(filter_field, filter_value, mode))
+
+    return predicates
+
+
+def predicate_sql(predicate):
+    """Translate a predicate into (sql, params)"""
+    kind = predicate[0]
+    if kind == "range":
+        _, column, low, high, low_inclusive, high_inclusive = predicate
+        parts, params = [], []
+        if low is not None:
+            parts.append(f"{column} {'>=' if low_inclusive else '>'} ?")
+            params.append(low)
+        if high is not None:
+            parts.append(f"{column} {'<=' if high_inclusive else '<'} ?")
+            params.append(high)
+        if column == "id" and low == high and low_inclusive and high_inclusive:
+            return "id = ?", [low]
+        return "(" + " AND ".join(parts) + ")", params
+    if kind == "any":
+        clauses = [predicate_sql(p) for p in predicate[1]]
+        return "(" + " OR ".join(sql for sql, _ in clauses) + ")", [v for _, params in clauses for v in params]
+    if kind == "like":
+        _, column, text = predicate
+        if column == "id":
+            return "CAST(id AS TEXT) LIKE ?", [f"%{text}%"]
+        return f"{column} LIKE ?", [f"%{text}%"]
+    if kind == "none":
+        return "0", []
+    if kind == "keyset":
+        return keyset_clause(*predicate[1:])
+    raise ValueError(f"Unknown predicate {kind}")
+
+
+def predicates_sql(predicates):
+    where_clauses = []
+    params = []
+    for predicate in predicates:
+        sql, predicate_params = predicate_sql(predicate)
+        where_clauses.append(sql)
+        params.extend(predicate_params)
+    return where_clauses, params
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_field, sort_order, row):
+    """Opaque cursor pointing just past `row` (a tuple in CONFIG_COLUMNS order)"""
+    payload = {
+        "f": sort_field,
+        "o": sort_order,
+        "v": row[CONFIG_COLUMNS.index(sort_field)],
+        "id": row[0],
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort_field, sort_order):
+    """Return (sort_value, id) from a cursor made for the same sort"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, last_id = payload["v"], int(payload["id"])
+        field, order = payload["f"], payload["o"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if field != sort_field or order != sort_order:
+        raise InvalidCursor("cursor was created for a different sort")
+    return value, last_id
+
+
+def keyset_clause(sort_field, sort_order, value, last_id):
+    """
+    WHERE clause selecting the rows after (value, last_id) in the order
+    `ORDER BY sort_field <order>, id <order>`. SQLite sorts NULLs first in
+    ascending order and last in descending order, which is mirrored here.
+    """
+    if sort_field == "id":
+        return ("id > ?" if sort_order == "asc" else "id < ?"), [last_id]
+    column = sort_field
+    if sort_order == "asc":
+        if value is None:
+            return f"(({column} IS NULL AND id > ?) OR {column} IS NOT NULL)", [last_id]
+        return f"({column} > ? OR ({column} = ? AND id > ?))", [value, value, last_id]
+    if value is None:
+        return f"({column} IS NULL AND id < ?)", [last_id]
+    return f"({column} < ? OR ({column} = ? AND id < ?) OR {column} IS NULL)", [value, value, last_id]
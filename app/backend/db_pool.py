@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import threading
+from time import perf_counter
+from urllib.request import pathname2url
+
+
+class ConnectionPool:
+    """
+    Per-process pool of read-only SQLite connections, one per thread.
+
+    XGStels.db never changes while the app runs, so connections are opened
+    with `mode=ro&immutable=1`, which lets SQLite skip locking and change
+    detection entirely. Each thread keeps its connection (and its page cache)
+    for the lifetime of the worker. Restart the workers after rebuilding the
+    database.
+    """
+
+    def __init__(self, db_path, cache_size_kib=65536, mmap_size=256 * 1024**2):
+        self.db_path = db_path
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._acquire_seconds = 0.0
+        self._max_acquire_seconds = 0.0
+        self._open = 0
+
+    def _open_connection(self):
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True)
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def connection(self):
+        """Return this thread's connection, opening it on first use. Do not close it."""
+        start = perf_counter()
+        conn = getattr(self._local, "conn", None)
+        hit = conn is not None and self._local.pid == os.getpid()
+        if not hit:
+            # Connections inherited through fork are never reused
+            conn = self._open_connection()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        elapsed = perf_counter() - start
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+                self._open += 1
+            self._acquire_seconds += elapsed
+            self._max_acquire_seconds = max(self._max_acquire_seconds, elapsed)
+        return conn
+
+    def stats(self):
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                "pid": os.getpid(),
+                "connections_opened": self._open,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / requests if requests else None,
+                "avg_wait_ms": 1000 * self._acquire_seconds / requests if requests else None,
+                "max_wait_ms": 1000 * self._max_acquire_seconds,
+            }
@@ -0,0 +1,360 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# Operations of one virtual user and their default weights. A page view
+# requests /api/plot and /api/grid for the same configuration, like the plot
+# page; "warm" ones pick from a small set of configurations rendered before
+# the run, "cold" ones from configurations not requested yet.
+DEFAULT_MIX = {
+    "configs": 50,
+    "ranges": 10,
+    "scatter": 10,
+    "page_warm": 25,
+    "page_cold": 5,
+}
+
+# Slider columns filtered by the "configs" operation
+SLIDER_FIELDS = ["iota", "etabar", "r_singularity", "rc1", "beta"]
+
+# Reported latency percentiles
+PERCENTILES = (50, 95, 99)
+
+
+class TestClientTarget:
+    """Requests through Flask's test client, in this process"""
+
+    name = "test-client"
+
+    def __init__(self, routes):
+        self.app = routes.app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def get(path):
+            response = client.get(path)
+            return response.status_code, response.get_data()
+        return get
+
+    def close(self):
+        pass
+
+
+class HttpTarget:
+    """Requests over HTTP to a running server, one keep-alive connection per virtual user"""
+
+    name = "http"
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+
+    def session(self):
+        state = {"conn": None}
+
+        def get(path):
+            for attempt in range(2):
+                if state["conn"] is None:
+                    state["conn"] = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                try:
+                    state["conn"].request("GET", self.prefix + path)
+                    response = state["conn"].getresponse()
+                    body = response.read()
+                    if response.getheader("Connection", "").lower() == "close":
+                        state["conn"].close()
+                        state["conn"] = None
+                    return response.status, body
+                except (OSError, http.client.HTTPException):
+                    # Stale keep-alive connection: reconnect once, then give up
+                    state["conn"].close()
+                    state["conn"] = None
+                    if attempt:
+                        raise
+        return get
+
+    def close(self):
+        pass
+
+
+class GunicornTarget(HttpTarget):
+    """A local gunicorn instance running app.backend.routes:app, started for the run"""
+
+    name = "gunicorn"
+
+    def __init__(self, workers, threads, port, timeout, env):
+        super().__init__(f"http://127.0.0.1:{port}", timeout)
+        repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        command = [
+            sys.executable, "-m", "gunicorn", "app.backend.routes:app",
+            "-w", str(workers), "--threads", str(threads), "-b", f"127.0.0.1:{port}", "--timeout", "300",
+        ]
+        print("Starting " + " ".join(command[2:]))
+        self.process = subprocess.Popen(command, cwd=repo_root, env=dict(os.environ, **env))
+        get = self.session()
+        deadline = time.time() + 300
+        while True:
+            if self.process.poll() is not None:
+                sys.exit("gunicorn exited during startup")
+            try:
+                if get("/api/ranges")[0] == 200:
+                    return
+            except (OSError, http.client.HTTPException):
+                pass
+            if time.time() > deadline:
+                self.close()
+                sys.exit("gunicorn did not become ready within 300 seconds")
+            time.sleep(1)
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class Workload:
+    """Builds the request paths of each operation from the data being served"""
+
+    def __init__(self, get, hot_set_size, seed):
+        self.ranges = self._json(get, "/api/ranges")
+        ids = [config["id"] for config in self._json(get, "/api/configs?limit=1000&count=none")["configs"]]
+        rng = random.Random(seed)
+        rng.shuffle(ids)
+        self.hot_ids = ids[:hot_set_size]
+        self._cold_ids = iter(ids[hot_set_size:])
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _json(get, path):
+        status, body = get(path)
+        if status != 200:
+            sys.exit(f"{path} returned {status}")
+        return json.loads(body)
+
+    def next_cold_id(self):
+        with self._lock:
+            return next(self._cold_ids, None)
+
+    def configs_path(self, rng):
+        """A slider-driven /api/configs request: one to three random sub-ranges and a page"""
+        params = []
+        for field in rng.sample(SLIDER_FIELDS, rng.randint(1, 3)):
+            bounds = self.ranges.get(field) or {}
+            low, high = bounds.get("min"), bounds.get("max")
+            if low is None or high is None:
+                continue
+            a, b = sorted(rng.uniform(low, high) for _ in range(2))
+            params.append(f"{field}_min={a:.6g}&{field}_max={b:.6g}")
+        params.append(f"page={rng.choice([1, 1, 1, 2, 3])}&limit={rng.choice([50, 100, 500])}")
+        return "/api/configs?" + "&".join(params)
+
+    def requests(self, operation, rng):
+        """[(label, path)] issued in order by one operation"""
+        if operation == "configs":
+            return [("configs", self.configs_path(rng))]
+        if operation == "ranges":
+            return [("ranges", "/api/ranges")]
+        if operation == "scatter":
+            return [("scatter", f"/api/scatter?seed={rng.randint(0, 3)}")]
+        if operation == "page_warm":
+            config_id = rng.choice(self.hot_ids)
+            return [("plot_warm", f"/api/plot/{config_id}"), ("grid_warm", f"/api/grid/{config_id}")]
+        if operation == "page_cold":
+            config_id = self.next_cold_id()
+            if config_id is None:
+                # Every configuration has been requested once; fall back to warm ones
+                return self.requests("page_warm", rng)
+            return [("plot_cold", f"/api/plot/{config_id}"), ("grid_cold", f"/api/grid/{config_id}")]
+        raise ValueError(f"Unknown operation {operation}")
+
+
+def run_step(target, workload, mix, concurrency, duration, think_time, seed):
+    """Run `concurrency` closed-loop virtual users for `duration` seconds"""
+    operations = list(mix)
+    weights = [mix[operation] for operation in operations]
+    samples = []
+    samples_lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def user(index):
+        rng = random.Random(seed * 1000003 + concurrency * 1009 + index)
+        get = target.session()
+        local = []
+        while time.time() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            for label, path in workload.requests(operation, rng):
+                start = time.perf_counter()
+                try:
+                    status, body = get(path)
+                    size = len(body)
+                except Exception as e:
+                    status, size = f"error: {type(e).__name__}", 0
+                local.append((label, time.perf_counter() - start, status, size))
+            if think_time:
+                time.sleep(rng.expovariate(1 / think_time))
+        with samples_lock:
+            samples.extend(local)
+
+    start = time.time()
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize_step(samples, time.time() - start, concurrency)
+
+
+def summarize_latencies(samples):
+    latencies = np.array([sample[1] for sample in samples])
+    statuses = [sample[2] for sample in samples]
+    result = {
+        "requests": len(samples),
+        "errors": sum(1 for status in statuses if not isinstance(status, int) or status >= 400),
+        "rejected": sum(1 for status in statuses if status == 503),
+        "bytes": int(sum(sample[3] for sample in samples)),
+    }
+    result["error_rate"] = result["errors"] / len(samples) if samples else 0
+    for p in PERCENTILES:
+        result[f"p{p}"] = float(np.percentile(latencies, p)) if len(latencies) else None
+    return result
+
+
+def summarize_step(samples, elapsed, concurrency):
+    labels = sorted({sample[0] for sample in samples})
+    step = {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "throughput": len(samples) / elapsed if elapsed else 0,
+        "total": summarize_latencies(samples),
+        "by_request": {label: summarize_latencies([s for s in samples if s[0] == label]) for label in labels},
+    }
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample[2])] = statuses.get(str(sample[2]), 0) + 1
+    step["statuses"] = statuses
+    return step
+
+
+def print_step(step):
+    total = step["total"]
+    print(f"\nconcurrency {step['concurrency']}: {total['requests']} requests in {step['seconds']:.1f} s, "
+          f"{step['throughput']:.1f} req/s, error rate {total['error_rate']:.1%} "
+          f"(503: {total['rejected']}), statuses {step['statuses']}")
+    print(f"  {'request':<12}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for label, result in [("all", total)] + list(step["by_request"].items()):
+        print(f"  {label:<12}{result['requests']:>8}" + "".join(
+            f"{result[f'p{p}'] * 1000:>10.1f}" for p in PERCENTILES
+        ) + f"{result['errors']:>8}")
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    if text:
+        for item in text.split(","):
+            operation, _, weight = item.partition("=")
+            if operation.strip() not in DEFAULT_MIX:
+                sys.exit(f"Unknown operation {operation!r}; choose from {', '.join(DEFAULT_MIX)}")
+            mix[operation.strip()] = float(weight)
+    return {operation: weight for operation, weight in mix.items() if weight > 0}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a weighted mix of API traffic at increasing concurrency")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Base URL of a running server (e.g. http://127.0.0.1:5000)")
+    target.add_argument("--gunicorn", action="store_true",
+                        help="Start a local gunicorn instance for the run (default: Flask test client in this process)")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers (with --gunicorn)")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker (with --gunicorn)")
+    parser.add_argument("--port", type=int, default=5055, help="Port for --gunicorn")
+    parser.add_argument("--db", help="XGStels database to serve (default: the app's own; not with --url)")
+    parser.add_argument("--concurrency", default="1,2,4,8,16",
+                        help="Comma-separated numbers of concurrent virtual users, one step each")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per concurrency step")
+    parser.add_argument("--think-time", type=float, default=0,
+                        help="Mean pause between operations of one user, in seconds (default: none)")
+    parser.add_argument("--mix", help=f"Operation weights, e.g. configs=50,page_cold=0 (default: {DEFAULT_MIX})")
+    parser.add_argument("--hot-set", type=int, default=20,
+                        help="Configurations rendered before the run and used by page_warm")
+    parser.add_argument("--timeout", type=float, default=300, help="HTTP timeout per request in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest.json", help="Where to write the results (JSON)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    mix = parse_mix(args.mix)
+    steps = [int(c) for c in args.concurrency.split(",")]
+
+    # The app under test gets empty caches, so page_cold really renders
+    workdir = tempfile.mkdtemp(prefix="stellarator-loadtest-")
+    env = {
+        "STELLARATOR_CACHE_DIR": os.path.join(workdir, "cache"),
+        "STELLARATOR_PRECOMPUTED_DIR": os.path.join(workdir, "precomputed"),
+    }
+    if args.db:
+        env["STELLARATOR_DB"] = os.path.abspath(args.db)
+
+    if args.url:
+        target = HttpTarget(args.url, args.timeout)
+    elif args.gunicorn:
+        target = GunicornTarget(args.workers, args.threads, args.port, args.timeout, env)
+    else:
+        os.environ.update(env)
+        try:
+            from . import routes
+        except ImportError:
+            import routes
+        target = TestClientTarget(routes)
+
+    try:
+        workload = Workload(target.session(), args.hot_set, args.seed)
+        print(f"Rendering {len(workload.hot_ids)} configurations for page_warm")
+        get = target.session()
+        for config_id in workload.hot_ids:
+            get(f"/api/plot/{config_id}")
+            get(f"/api/grid/{config_id}")
+
+        results = []
+        for concurrency in steps:
+            step = run_step(target, workload, mix, concurrency, args.duration, args.think_time, args.seed)
+            print_step(step)
+            results.append(step)
+    finally:
+        target.close()
+
+    output = {
+        "meta": {
+            "target": args.url or target.name,
+            "workers": args.workers if args.gunicorn else None,
+            "threads": args.threads if args.gunicorn else None,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "cpu_count": os.cpu_count(),
+            "mix": mix,
+            "args": vars(args),
+        },
+        "steps": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
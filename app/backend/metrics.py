@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter, time
+
+try:
+    from .result_cache import write_atomic
+except ImportError:
+    from result_cache import write_atomic
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+HELP = {
+    "stellarator_requests_total": ("counter", "HTTP requests by endpoint, method and status"),
+    "stellarator_request_seconds": ("histogram", "Time to response headers by endpoint"),
+    "stellarator_response_bytes": ("histogram", "Response body size by endpoint (when known up front)"),
+    "stellarator_span_seconds": ("histogram", "Duration of named steps: db_query, qsc, get_boundary, b_mag, matplotlib, json"),
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    labels = tuple(labels) + tuple(extra)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metrics:
+    """
+    Counters and histograms, exposed in the Prometheus text format.
+
+    Every process keeps its own values and writes them to
+    `<directory>/<pid>.json` at most every `flush_interval` seconds; render()
+    adds up the files of all live processes, so one scrape of any gunicorn
+    worker covers all workers and their compute processes. Files of exited
+    processes are removed, which Prometheus sees as a counter reset.
+
+    span(name) times a block into stellarator_span_seconds and, between
+    start_request() and finish_request(), also collects it for the current
+    thread's Server-Timing header.
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._local = threading.local()
+        self._last_flush = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._maybe_flush()
+
+    def observe(self, name, value, labels=(), buckets=LATENCY_BUCKETS):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0, "count": 0}
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+        self._maybe_flush()
+
+    @contextmanager
+    def span(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(name, perf_counter() - start)
+
+    def record_span(self, name, seconds):
+        self.observe("stellarator_span_seconds", seconds, (("span", name),))
+        self.add_request_spans([(name, seconds)])
+
+    def start_request(self):
+        self._local.spans = []
+
+    def add_request_spans(self, spans):
+        """Attach spans (e.g. measured in a compute process) to the current request"""
+        collected = getattr(self._local, "spans", None)
+        if collected is not None and spans:
+            collected.extend(spans)
+
+    def finish_request(self):
+        spans = getattr(self._local, "spans", None)
+        self._local.spans = None
+        return spans or []
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+                "histograms": [
+                    [name, labels, h["buckets"], list(h["counts"]), h["sum"], h["count"]]
+                    for (name, labels), h in self._histograms.items()
+                ],
+            }
+
+    def _maybe_flush(self):
+        if self.directory and time() - self._last_flush > self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.directory:
+            return
+        self._last_flush = time()
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        try:
+            # Through a unique temporary file: threads of one process flush concurrently
+            write_atomic(path, json.dumps(self.snapshot()).encode("utf-8"))
+        except OSError as e:
+            print(f"Could not write metrics to {path}: {e}")
+
+    def _snapshots(self):
+        """Snapshots of this process and of every other live process"""
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                pid = int(filename[:-5])
+                if pid != os.getpid():
+                    os.kill(pid, 0)
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except ProcessLookupError:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            except (ValueError, OSError):
+                # Not ours, being replaced or owned by another user; skip it
+                continue
+        return snapshots
+
+    def render(self):
+        counters = {}
+        histograms = {}
+        for snapshot in self._snapshots():
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets, counts, total, count in snapshot["histograms"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged = histograms.setdefault(key, [buckets, [0] * len(buckets), 0, 0])
+                merged[1] = [a + b for a, b in zip(merged[1], counts)]
+                merged[2] += total
+                merged[3] += count
+
+        lines = []
+        for name, (kind, help_text) in HELP.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (metric, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def server_timing(spans, total=None):
+    """Server-Timing header value; spans with the same name are added up"""
+    durations = {}
+    for name, seconds in spans:
+        durations[name] = durations.get(name, 0) + seconds
+    if total is not None:
+        durations["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items())
@@ -0,0 +1,268 @@
+import functools
+import numpy as np
+import jax
+import jax.numpy as jnp
+
+# Quantities returned by evaluate_rows, per configuration
+BATCH_FIELDS = [
+    "axis_length", "iota", "helicity", "max_elongation", "mean_elongation",
+    "min_R0", "min_L_grad_B", "rms_curvature", "residual", "converged",
+]
+
+# Newton solve of the sigma equation, as in qsc.newton
+NEWTON_ITERATIONS = 20
+NEWTON_TOLERANCE = 1e-13
+LINE_SEARCH_STEPS = 10
+
+# Extrema of periodic profiles are refined on a grid this many times finer
+# (qsc refines them with a scalar minimizer instead)
+REFINE_FACTOR = 16
+
+# Padded batch lengths: small requests use the first, larger ones are split
+# into chunks of the second
+BATCH_SIZES = (32, 256)
+
+
+def enable_x64():
+    """
+    Context manager turning on 64-bit JAX types for the current thread only;
+    the Newton solve and NEWTON_TOLERANCE need float64. (Newer JAX moved it
+    out of jax.experimental.)
+    """
+    if hasattr(jax, "enable_x64"):
+        return jax.enable_x64(True)
+    from jax.experimental import enable_x64
+    return enable_x64()
+
+
+def spectral_diff_matrix(n, xmax):
+    """Periodic spectral differentiation matrix on [0, xmax), as in qsc"""
+    h = 2 * np.pi / n
+    kk = np.arange(1, n)
+    n1 = (n - 1) // 2
+    n2 = -(-(n - 1) // 2)
+    if n % 2 == 0:
+        topc = 1 / np.tan(np.arange(1, n2 + 1) * h / 2)
+        temp = np.concatenate((topc, -np.flip(topc[0:n1])))
+    else:
+        topc = 1 / np.sin(np.arange(1, n2 + 1) * h / 2)
+        temp = np.concatenate((topc, np.flip(topc[0:n1])))
+    col1 = np.concatenate(([0], 0.5 * ((-1) ** kk) * temp))
+    offsets = np.arange(n)[:, None] - np.arange(n)[None, :]
+    toeplitz = np.where(offsets >= 0, col1[np.abs(offsets)], -col1[np.abs(offsets)])
+    return 2 * np.pi / xmax * toeplitz
+
+
+def _refined_min(y):
+    """
+    Minimum of the Fourier interpolant of a periodic profile, searched on a
+    REFINE_FACTOR times finer grid within one grid cell of the discrete
+    minimum, like qsc's fourier_minimum (ringing elsewhere is ignored).
+    """
+    n = y.shape[-1]
+    refined = jnp.fft.irfft(jnp.fft.rfft(y), n * REFINE_FACTOR) * REFINE_FACTOR
+    window = jnp.argmin(y) * REFINE_FACTOR + jnp.arange(-REFINE_FACTOR, REFINE_FACTOR + 1)
+    return jnp.min(refined[window % (n * REFINE_FACTOR)])
+
+
+def _evaluate(rc, zs, etabar, nfp, nphi):
+    """
+    First-order near-axis solution for one stellarator-symmetric
+    configuration (B0 = 1, sG = spsi = 1, I2 = 0, sigma0 = 0), following
+    qsc's init_axis, solve_sigma_equation and r1_diagnostics.
+    """
+    phi = jnp.linspace(0, 2 * jnp.pi / nfp, nphi, endpoint=False)
+    d_phi = phi[1] - phi[0]
+    n = jnp.arange(rc.shape[0]) * nfp
+    sin = jnp.sin(n[:, None] * phi[None, :])
+    cos = jnp.cos(n[:, None] * phi[None, :])
+
+    R0 = rc @ cos
+    Z0 = zs @ sin
+    R0p = (-n * rc) @ sin
+    Z0p = (n * zs) @ cos
+    R0pp = (-n * n * rc) @ cos
+    Z0pp = (-n * n * zs) @ sin
+    R0ppp = (n**3 * rc) @ sin
+    Z0ppp = (-n**3 * zs) @ cos
+
+    d_l_d_phi = jnp.sqrt(R0 * R0 + R0p * R0p + Z0p * Z0p)
+    d2_l_d_phi2 = (R0 * R0p + R0p * R0pp + Z0p * Z0pp) / d_l_d_phi
+    B0_over_abs_G0 = nphi / jnp.sum(d_l_d_phi)
+    abs_G0_over_B0 = 1 / B0_over_abs_G0
+    G0 = abs_G0_over_B0
+
+    d_r = jnp.stack([R0p, R0, Z0p], axis=1)
+    d2_r = jnp.stack([R0pp - R0, 2 * R0p, Z0pp], axis=1)
+    d3_r = jnp.stack([R0ppp - 3 * R0p, 3 * R0pp - R0, Z0ppp], axis=1)
+
+    tangent = d_r / d_l_d_phi[:, None]
+    d_tangent_d_l = (-d_r * (d2_l_d_phi2 / d_l_d_phi)[:, None] + d2_r) / (d_l_d_phi * d_l_d_phi)[:, None]
+    curvature = jnp.sqrt(jnp.sum(d_tangent_d_l * d_tangent_d_l, axis=1))
+    normal = d_tangent_d_l / curvature[:, None]
+    axis_length = jnp.sum(d_l_d_phi) * d_phi * nfp
+    rms_curvature = jnp.sqrt(jnp.sum(curvature * curvature * d_l_d_phi) * d_phi * nfp / axis_length)
+
+    cross = jnp.cross(d_r, d2_r)
+    torsion = jnp.sum(cross * d3_r, axis=1) / jnp.sum(cross * cross, axis=1)
+
+    # Number of poloidal turns of the normal vector (qsc _determine_helicity)
+    quadrant = jnp.where(
+        normal[:, 0] >= 0,
+        jnp.where(normal[:, 2] >= 0, 1, 4),
+        jnp.where(normal[:, 2] >= 0, 2, 3),
+    )
+    following = jnp.roll(quadrant, -1)
+    steps = jnp.where(
+        (quadrant == 4) & (following == 1), 1,
+        jnp.where((quadrant == 1) & (following == 4), -1, following - quadrant),
+    )
+    helicity = jnp.sum(steps) / 4
+
+    d_d_phi = jnp.asarray(spectral_diff_matrix(nphi, 2 * np.pi / nfp))
+    d_varphi_d_phi = B0_over_abs_G0 * d_l_d_phi
+    d_d_varphi = d_d_phi / d_varphi_d_phi[:, None]
+    etabar_squared_over_curvature_squared = etabar * etabar / (curvature * curvature)
+
+    # State vector: sigma on the phi grid, with iota in place of sigma[0]
+    def residual(x):
+        sigma = x.at[0].set(0.0)
+        iota = x[0]
+        return (
+            d_d_varphi @ sigma
+            + (iota + helicity * nfp)
+            * (etabar_squared_over_curvature_squared**2 + 1 + sigma * sigma)
+            + 2 * etabar_squared_over_curvature_squared * torsion * G0
+        )
+
+    def jacobian(x):
+        sigma = x.at[0].set(0.0)
+        iota = x[0]
+        jac = d_d_varphi + jnp.diag((iota + helicity * nfp) * 2 * sigma)
+        return jac.at[:, 0].set(etabar_squared_over_curvature_squared**2 + 1 + sigma * sigma)
+
+    scales = 0.5 ** jnp.arange(LINE_SEARCH_STEPS)
+
+    def newton_step(state):
+        i, x, norm, done = state
+        previous = norm
+        step = -jnp.linalg.solve(jacobian(x), residual(x))
+        # Every line-search step at once; take the largest that reduces the residual
+        trials = x[None, :] + scales[:, None] * step[None, :]
+        norms = jnp.sqrt(jnp.sum(jax.vmap(residual)(trials) ** 2, axis=1))
+        improved = norms < norm
+        best = jnp.argmax(improved)
+        accept = ~done & improved[best]
+        x = jnp.where(accept, trials[best], x)
+        norm = jnp.where(accept, norms[best], norm)
+        # Also stop once the residual is at round-off level and no longer
+        # dropping quickly; qsc keeps iterating there without changing iota
+        stalled = (norm < NEWTON_TOLERANCE * 1e4) & (norm > 0.1 * previous)
+        done = done | ~improved[best] | (norm < NEWTON_TOLERANCE) | stalled
+        return i + 1, x, norm, done
+
+    x0 = jnp.zeros(nphi)
+    norm0 = jnp.sqrt(jnp.sum(residual(x0) ** 2))
+    # Under vmap the loop runs until every configuration in the batch is done
+    _, x, norm, _ = jax.lax.while_loop(
+        lambda state: (state[0] < NEWTON_ITERATIONS) & ~state[3],
+        newton_step,
+        (0, x0, norm0, norm0 < NEWTON_TOLERANCE),
+    )
+    iota = x[0]
+    iotaN = iota + helicity * nfp
+    sigma = x.at[0].set(0.0)
+
+    X1c = etabar / curvature
+    Y1s = curvature / etabar
+    Y1c = curvature * sigma / etabar
+    p = X1c * X1c + Y1s * Y1s + Y1c * Y1c
+    q = -X1c * Y1s
+    elongation = (p + jnp.sqrt(p * p - 4 * q * q)) / (2 * jnp.abs(q))
+    mean_elongation = jnp.sum(elongation * d_l_d_phi) / jnp.sum(d_l_d_phi)
+
+    # Frobenius norm of the first-order grad B tensor (qsc calculate_grad_B_tensor)
+    factor = 1 / abs_G0_over_B0
+    d_X1c_d_varphi = d_d_varphi @ X1c
+    d_Y1s_d_varphi = d_d_varphi @ Y1s
+    d_Y1c_d_varphi = d_d_varphi @ Y1c
+    tn = curvature
+    bb = factor * (X1c * d_Y1s_d_varphi - iotaN * X1c * Y1c)
+    nn = factor * (d_X1c_d_varphi * Y1s + iotaN * X1c * Y1c)
+    bn = factor * (-abs_G0_over_B0 * torsion - iotaN * X1c * X1c)
+    nb = factor * (d_Y1c_d_varphi * Y1s - d_Y1s_d_varphi * Y1c
+                   + abs_G0_over_B0 * torsion + iotaN * (Y1s * Y1s + Y1c * Y1c))
+    grad_B_colon_grad_B = 2 * tn * tn + bb * bb + nn * nn + nb * nb + bn * bn
+    L_grad_B = jnp.sqrt(2 / grad_B_colon_grad_B)
+
+    return {
+        "axis_length": axis_length,
+        "iota": iota,
+        "helicity": helicity,
+        "max_elongation": -_refined_min(-elongation),
+        "mean_elongation": mean_elongation,
+        "min_R0": _refined_min(R0),
+        "min_L_grad_B": _refined_min(L_grad_B),
+        "rms_curvature": rms_curvature,
+        "residual": norm,
+        "converged": norm < NEWTON_TOLERANCE * 1e4,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def batch_function(nfp, nphi):
+    """Compiled evaluation of a (batch, nfourier) block of configurations sharing nfp; call under enable_x64"""
+    return jax.jit(jax.vmap(functools.partial(_evaluate, nfp=nfp, nphi=nphi)))
+
+
+def batch_chunks(size):
+    """
+    Split `size` rows into (start, stop, padded) chunks whose padded lengths
+    are all in BATCH_SIZES, so only a couple of shapes per nfp get compiled.
+    """
+    small, large = BATCH_SIZES
+    if size <= small:
+        return [(0, size, small)]
+    return [(start, min(start + large, size), large) for start in range(0, size, large)]
+
+
+def evaluate_rows(configs, nphi):
+    """
+    Evaluate many XGStels rows (in fetch_configs layout) in vectorized calls
+    per nfp. Returns {config_id: {field: value}} with the BATCH_FIELDS.
+
+    Rows are grouped by nfp; rc/zs are padded with zeros to a common number
+    of Fourier modes, and each chunk is padded to a fixed batch size by
+    repeating its first row. Evaluation runs under enable_x64, so the rest
+    of the process keeps JAX's default 32-bit types.
+    """
+    with enable_x64():
+        return _evaluate_rows(configs, nphi)
+
+
+def _evaluate_rows(configs, nphi):
+    groups = {}
+    for config in configs:
+        groups.setdefault(int(config[7]), []).append(config)
+
+    results = {}
+    for nfp, rows in groups.items():
+        rc = [[1, row[1], row[2], row[3]] for row in rows]
+        zs = [[0, row[4], row[5], row[6]] for row in rows]
+        nfourier = max(max(len(r) for r in rc), max(len(z) for z in zs))
+        rc = np.array([r + [0] * (nfourier - len(r)) for r in rc], dtype=np.float64)
+        zs = np.array([z + [0] * (nfourier - len(z)) for z in zs], dtype=np.float64)
+        etabar = np.array([row[8] for row in rows], dtype=np.float64)
+
+        evaluate = batch_function(nfp, nphi)
+        for start, stop, padded in batch_chunks(len(rows)):
+            take = np.arange(start, start + padded)
+            take[stop - start:] = start
+            out = evaluate(rc[take], zs[take], etabar[take])
+            out = {name: np.asarray(values)[:stop - start] for name, values in out.items()}
+            for i, row in enumerate(rows[start:stop]):
+                results[row[0]] = {
+                    name: (bool(out[name][i]) if name == "converged" else float(out[name][i]))
+                    for name in BATCH_FIELDS
+                }
+    return results
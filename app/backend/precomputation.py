@@ -1,198 +1,326 @@
-import os
+import argparse
+import hashlib
 import json
-import base64
-import concurrent.futures
+import os
+import queue
+import shutil
+import signal
+import sqlite3
 import time
 import psutil
-from routesold import fetch_configs, generate_plot, generate_grid_plot
-
-# Create directories if they don't exist
-os.makedirs("precomputed/boundary/json", exist_ok=True)
-os.makedirs("precomputed/boundary/png", exist_ok=True)
-os.makedirs("precomputed/diagnostics/json", exist_ok=True)
-os.makedirs("precomputed/diagnostics/png", exist_ok=True)
-
-# Add this class to your file
-class BatchWriter:
-    def __init__(self):
-        self.buffer = {}
-    
-    def write(self, path, data, binary=False):
-        self.buffer[path] = (data, binary)
-        if len(self.buffer) >= 5:  # Flush every 5 files
-            self.flush()
-    
-    def flush(self):
-        for path, (data, binary) in self.buffer.items():
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            mode = "wb" if binary else "w"
-            with open(path, mode) as f:
-                f.write(data)
-        self.buffer.clear()
-
-# Function to process a single configuration
-def process_config(config):
+
+try:
+    from . import routes
+    from . import compression
+    from .worker_process import TaskTimeout, init_worker, spawn_context
+except ImportError:
+    import routes
+    import compression
+    from worker_process import TaskTimeout, init_worker, spawn_context
+
+
+# Extra time the parent waits past --timeout before it gives up on a task
+TIMEOUT_GRACE = 30
+
+
+def params_hash():
+    # A rebuilt database can hold a different configuration under the same id
+    payload = json.dumps(dict(routes.render_params(), db_version=routes.db_version), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JobTable:
+    """
+    Per-configuration checkpoints for the precompute job, kept in SQLite so a
+    restart skips exactly the configurations that already finished.
+    Only the parent process writes to it.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                config_id INTEGER PRIMARY KEY,
+                status TEXT NOT NULL,
+                boundary_success INTEGER NOT NULL DEFAULT 0,
+                diagnostics_success INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                elapsed REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+    def reset(self):
+        self.conn.execute("DELETE FROM jobs")
+        self.conn.commit()
+
+    def finished_ids(self, retry_failed=False):
+        statuses = ("done",) if retry_failed else ("done", "failed", "timeout")
+        placeholders = ", ".join("?" for _ in statuses)
+        rows = self.conn.execute(
+            f"SELECT config_id FROM jobs WHERE status IN ({placeholders})", statuses
+        )
+        return {row[0] for row in rows}
+
+    def record(self, result):
+        self.conn.execute(
+            """
+            INSERT INTO jobs (config_id, status, boundary_success, diagnostics_success,
+                              error, elapsed, attempts, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+            ON CONFLICT(config_id) DO UPDATE SET
+                status = excluded.status,
+                boundary_success = excluded.boundary_success,
+                diagnostics_success = excluded.diagnostics_success,
+                error = excluded.error,
+                elapsed = excluded.elapsed,
+                attempts = jobs.attempts + 1,
+                updated_at = excluded.updated_at
+            """,
+            (
+                result["config_id"],
+                result["status"],
+                int(result.get("boundary_success", False)),
+                int(result.get("diagnostics_success", False)),
+                result.get("error"),
+                result.get("elapsed"),
+                time.time(),
+            ),
+        )
+        self.conn.commit()
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+def store_artifact(kind, config_id, body):
+    routes.precomputed_store.store(kind, config_id, body)
+    # Compressed variants at the highest level, so requests never build them
+    compression.store_variants(routes.precomputed_store.response_path(kind, config_id))
+
+
+# Function to process a single configuration (runs in a worker process)
+def process_config(config, timeout):
     config_id = config[0]
-    
-    # Skip if both files already exist
-    if (os.path.exists(f"precomputed/boundary/json/{config_id}.json") and 
-        os.path.exists(f"precomputed/diagnostics/png/{config_id}.png")):
-        return {"config_id": config_id, "boundary_success": True, "diagnostics_success": True, "skipped": True}
-    
     result = {"config_id": config_id, "boundary_success": False, "diagnostics_success": False}
-    
-    # Generate boundary visualization
-    try:
-        boundary_result = generate_plot(config)
-        
-        # Save boundary PNG
-        if boundary_result["image"]:
-            writer = BatchWriter()
-            writer.write(f"precomputed/boundary/png/{config_id}.png", 
-                         base64.b64decode(boundary_result["image"]), binary=True)
-        
-        # Save boundary JSON
-        if boundary_result["interactive_data"]:
-            with open(f"precomputed/boundary/json/{config_id}.json", "w") as f:
-                f.write(boundary_result["interactive_data"])
-        
-        result["boundary_success"] = True
-    except Exception as e:
-        result["boundary_error"] = str(e)
-    
-    # Generate diagnostic plots
+    start_time = time.time()
+    signal.setitimer(signal.ITIMER_REAL, timeout)
     try:
-        grid_result = generate_grid_plot(config)
-        
-        # Save diagnostics PNG
-        if grid_result["image"]:
-            with open(f"precomputed/diagnostics/png/{config_id}.png", "wb") as f:
-                f.write(base64.b64decode(grid_result["image"]))
-        
-        # Save individual diagnostic JSONs
-        if grid_result["interactive_data"]:
-            os.makedirs(f"precomputed/diagnostics/json/{config_id}", exist_ok=True)
-            
-            for name, plot_json in grid_result["interactive_data"].items():
-                try:
-                    safe_name = name.replace('/', '_').replace('\\', '_')
-                    plot_path = f"precomputed/diagnostics/json/{config_id}/{safe_name}.json"
-                    with open(plot_path, "w") as f:
-                        f.write(plot_json)
-                except Exception:
-                    pass
-                    
-        result["diagnostics_success"] = True
+        # One Qsc instance serves both the boundary and the diagnostics
+        stel = routes.get_stel_from_config(config)
+
+        boundary_result = routes.generate_plot(stel, config)
+        if routes.plot_result_ok(boundary_result):
+            store_artifact("plot", config_id, routes.plot_response_body(boundary_result))
+            result["boundary_success"] = True
+        else:
+            result["error"] = boundary_result.get("error")
+
+        grid_result = routes.generate_grid_plot(stel)
+        if routes.plot_result_ok(grid_result):
+            store_artifact("grid", config_id, routes.plot_response_body(grid_result))
+            result["diagnostics_success"] = True
+        else:
+            result["error"] = grid_result.get("error")
+
+        ok = result["boundary_success"] and result["diagnostics_success"]
+        result["status"] = "done" if ok else "failed"
+    except TaskTimeout:
+        result["status"] = "timeout"
+        result["error"] = f"Timed out after {timeout} seconds"
     except Exception as e:
-        result["diagnostics_error"] = str(e)
-    
-    writer.flush()
+        result["status"] = "failed"
+        result["error"] = str(e)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    result["elapsed"] = time.time() - start_time
     return result
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precompute plot and grid responses for all configurations")
+    parser.add_argument("--workers", type=int, default=psutil.cpu_count(logical=False) or 1,
+                        help="Number of worker processes (default: physical cores)")
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="Per-configuration time budget in seconds")
+    parser.add_argument("--maxtasksperchild", type=int, default=50,
+                        help="Recycle each worker after this many configurations")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Also retry configurations that failed or timed out")
+    parser.add_argument("--axis-batch-size", type=int, default=4096,
+                        help="Configurations per vectorized first-order diagnostics batch (0 to skip)")
+    parser.add_argument("--reset", action="store_true",
+                        help="Discard existing artifacts and checkpoints (needed after render parameters or the database change)")
+    return parser.parse_args()
+
+
 def main():
-    # Fetch all configurations
-    configs = fetch_configs()
-    total = len(configs)
-    
-    # Define batch_size before using it in the resumption logic
-    batch_size = 100  # Move this line up here
-    
-    # Check for existing progress
-    start_batch = 0
+    args = parse_args()
+    store = routes.precomputed_store
+    os.makedirs(store.root, exist_ok=True)
+    jobs = JobTable(os.path.join(store.root, "jobs.db"))
+
+    current_hash = params_hash()
+    previous_hash = jobs.get_meta("params_hash")
+    if previous_hash is not None and previous_hash != current_hash and not args.reset:
+        print("Render parameters or database changed since the last run; rerun with --reset to start over")
+        return
+    if args.reset:
+        print("Discarding existing artifacts and checkpoints")
+        jobs.reset()
+        shutil.rmtree(os.path.join(store.root, "api"), ignore_errors=True)
+    jobs.set_meta("params_hash", current_hash)
+    store.write_manifest()
+
+    # Fetch all configurations and skip the ones already checkpointed
+    configs = routes.fetch_configs()
+    finished = jobs.finished_ids(retry_failed=args.retry_failed)
+    todo = [config for config in configs if config[0] not in finished]
+    total = len(todo)
+    print(f"{len(configs)} configurations, {len(configs) - total} already finished, {total} to compute")
+    if not total:
+        return
+
+    # First-order diagnostics for every configuration, vectorized per nfp in
+    # this process, before the per-configuration renders
+    if args.axis_batch_size > 0:
+        batch_start = time.time()
+        for start in range(0, total, args.axis_batch_size):
+            routes.axis_diagnostics(todo[start:start + args.axis_batch_size])
+            print(f"[{min(start + args.axis_batch_size, total)}/{total}] first-order diagnostics")
+        print(f"First-order diagnostics took {time.time() - batch_start:.1f} seconds")
+
+    print(f"Using {args.workers} worker processes, recycled every {args.maxtasksperchild} tasks")
+    results = queue.Queue()
+    pending = iter(todo)
+    # config_id -> (config, deadline). SIGALRM cannot interrupt native or XLA
+    # code, and a task whose worker is killed (e.g. out of memory) never
+    # returns, so the parent gives up on a task after its own deadline
+    in_flight = {}
+    deadline_seconds = args.timeout + TIMEOUT_GRACE
     completed = 0
     success_count = 0
     start_time = time.time()
-    
-    if os.path.exists("precomputation_progress.json"):
-        try:
-            with open("precomputation_progress.json", "r") as f:
-                progress = json.load(f)
-                start_batch = progress["last_batch"] + batch_size  # Now batch_size is defined
-                completed = progress["completed"]
-                success_count = progress["success_count"]
-                previous_elapsed = progress["elapsed_time"]
-                
-                # Adjust start time to account for previous work
-                start_time = time.time() - previous_elapsed
-                
-                print(f"Resuming from batch starting at index {start_batch}")
-                print(f"Already completed {completed} configurations ({success_count} successful)")
-        except Exception as e:
-            print(f"Error loading progress file: {e}")
-            print("Starting from the beginning")
-    
-    print(f"Starting batch precomputation for {total} stellarator configurations...")
-    
-    # Determine number of workers
-    physical_cores = psutil.cpu_count(logical=False)
-    max_workers = physical_cores  # Or even physical_cores - 1
-    print(f"Using {max_workers} CPU cores")
-    
-    # Process in batches of 100 configurations
-    batch_size = 100
-    
-    # Start from the batch where we left off
-    for batch_start in range(start_batch, total, batch_size):
-        batch_end = min(batch_start + batch_size, total)
-        batch_configs = configs[batch_start:batch_end]
-        
-        print(f"\nProcessing batch {batch_start//batch_size + 1}/{(total+batch_size-1)//batch_size}")
-        
-        # Check memory usage before submitting tasks
-        if psutil.virtual_memory().percent > 90:
-            print("Memory usage high (>90%), waiting 60 seconds before next batch")
-            time.sleep(60)
-        
-        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-            # Submit batch of tasks
-            future_to_config = {executor.submit(process_config, config): config[0] 
-                               for config in batch_configs}
-            
-            # In the main loop:
-            for future in concurrent.futures.as_completed(future_to_config):
-                config_id = future_to_config[future]
-                completed += 1
-                
-                try:
-                    # Add a timeout to prevent stuck tasks
-                    result = future.result(timeout=600)  # 5-minute timeout
-                    if result["boundary_success"] and result["diagnostics_success"]:
-                        success_count += 1
-                        status = "✓"
-                    else:
-                        status = "⚠"
-                    
-                    # Progress reporting
-                    elapsed = time.time() - start_time
-                    configs_per_second = completed / elapsed
-                    estimated_total_time = total / configs_per_second
-                    remaining_time = estimated_total_time - elapsed
-                    
-                    print(f"[{completed}/{total}] {status} Config {config_id} - "
-                          f"{configs_per_second:.2f} configs/sec - "
-                          f"Est. remaining: {remaining_time/3600:.1f} hours")
-                    
-                except concurrent.futures.TimeoutError:
-                    print(f"Configuration {config_id} timed out after 5 minutes")
-                except Exception as e:
-                    print(f"[{completed}/{total}] ✗ Error with config {config_id}: {e}")
-        
-        # Optional: Save progress after each batch
-        with open("precomputation_progress.json", "w") as f:
-            json.dump({
-                "completed": completed,
-                "success_count": success_count,
-                "last_batch": batch_start,
-                "elapsed_time": time.time() - start_time
-            }, f)
-    
+
+    def new_pool():
+        return spawn_context().Pool(args.workers, initializer=init_worker, maxtasksperchild=args.maxtasksperchild)
+
+    def submit(config):
+        in_flight[config[0]] = (config, time.time() + deadline_seconds)
+        pool.apply_async(
+            process_config, (config, args.timeout),
+            callback=results.put,
+            error_callback=lambda e, config_id=config[0]: results.put(
+                {"config_id": config_id, "status": "failed", "error": str(e)}
+            ),
+        )
+
+    def submit_next():
+        # At most one task per worker, so a task starts about when it is
+        # submitted and its deadline measures its own run time
+        if len(in_flight) >= args.workers:
+            return False
+        config = next(pending, None)
+        if config is None:
+            return False
+        submit(config)
+        return True
+
+    def report(result):
+        nonlocal completed, success_count
+        completed += 1
+        jobs.record(result)
+
+        if result["status"] == "done":
+            success_count += 1
+            status = "✓"
+        elif result["status"] == "timeout":
+            status = "⏱"
+        else:
+            status = "⚠" if result.get("boundary_success") or result.get("diagnostics_success") else "✗"
+
+        # Progress reporting
+        elapsed = time.time() - start_time
+        configs_per_second = completed / elapsed
+        remaining_time = (total - completed) / configs_per_second
+        print(f"[{completed}/{total}] {status} Config {result['config_id']} - "
+              f"{configs_per_second:.2f} configs/sec - "
+              f"Est. remaining: {remaining_time/3600:.1f} hours"
+              + (f" - {result['error']}" if result.get("error") else ""))
+
+    pool = new_pool()
+    try:
+        while submit_next():
+            pass
+
+        while in_flight:
+            next_deadline = min(deadline for _, deadline in in_flight.values())
+            try:
+                result = results.get(timeout=max(0, next_deadline - time.time()))
+            except queue.Empty:
+                result = None
+
+            if result is None:
+                # Record the overdue tasks, replace the pool (the only way to
+                # stop a stuck worker) and resubmit the others
+                now = time.time()
+                overdue = [config for config, deadline in in_flight.values() if deadline <= now]
+                print(f"{len(overdue)} task(s) past their deadline, restarting the worker pool")
+                pool.terminate()
+                pool.join()
+                pool = new_pool()
+                for config in overdue:
+                    del in_flight[config[0]]
+                    report({
+                        "config_id": config[0],
+                        "status": "timeout",
+                        "error": f"No result after {deadline_seconds:.0f} seconds (worker stuck or killed)",
+                        "elapsed": deadline_seconds,
+                    })
+                for config, _ in list(in_flight.values()):
+                    submit(config)
+            elif result["config_id"] in in_flight:
+                del in_flight[result["config_id"]]
+                report(result)
+
+            # Refill the window, holding back new work while memory is tight
+            if psutil.virtual_memory().percent > 90 and in_flight:
+                print("Memory usage high (>90%), letting running tasks drain")
+                continue
+            while submit_next():
+                pass
+    except KeyboardInterrupt:
+        print("\nInterrupted; finished configurations are checkpointed")
+        pool.terminate()
+        pool.join()
+        return
+
+    pool.close()
+    pool.join()
+
     # Final report
-    end_time = time.time()
-    total_time = end_time - start_time
+    total_time = time.time() - start_time
     print(f"\nPrecomputation complete!")
     print(f"Total time: {total_time/3600:.2f} hours")
     print(f"Successful configurations: {success_count}/{total}")
     print(f"Average processing time: {total_time/completed:.2f} seconds per configuration")
+    print(f"Job table: {jobs.counts()}")
+    print(f"Memoized boundary radii: {routes.radius_table.stats()}")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,118 @@
+import base64
+import json
+import os
+
+try:
+    from .result_cache import write_atomic
+except ImportError:
+    from result_cache import write_atomic
+
+
+class PrecomputedStore:
+    """
+    Read-through access to the artifacts written by precomputation.py.
+
+    Full API response bodies live in `api/<kind>/<id>.json` so routes can hand
+    the file straight to `send_file`. Older runs only wrote the raw Plotly
+    pieces (`boundary/json/<id>.json`, `boundary/png/<id>.png` and
+    `diagnostics/json/<id>/*.json`); those are assembled into a response body
+    once and written to the `api` layout on first use.
+
+    `manifest.json` records the render parameters and the database version
+    the artifacts were made with. If either disagrees with the current one
+    the store is ignored, so stale renders (or renders of a configuration
+    that a rebuilt database no longer has under that id) are never served.
+    A directory without a manifest predates it and is trusted as is.
+    """
+
+    def __init__(self, root, params, db_version):
+        self.root = root
+        self.params = params
+        self.db_version = db_version
+        self.enabled = self._manifest_matches()
+
+    def _manifest_path(self):
+        return os.path.join(self.root, "manifest.json")
+
+    def _manifest_matches(self):
+        try:
+            with open(self._manifest_path()) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Ignoring precomputed artifacts, unreadable manifest: {e}")
+            return False
+        if manifest.get("params") != self.params:
+            print("Ignoring precomputed artifacts, render parameters changed")
+            return False
+        if manifest.get("db_version") != self.db_version:
+            print("Ignoring precomputed artifacts, database changed")
+            return False
+        return True
+
+    def write_manifest(self):
+        data = json.dumps({"params": self.params, "db_version": self.db_version}, indent=2, sort_keys=True)
+        write_atomic(self._manifest_path(), data.encode("utf-8"))
+        self.enabled = True
+
+    def response_path(self, kind, config_id):
+        return os.path.join(self.root, "api", kind, f"{config_id}.json")
+
+    def lookup(self, kind, config_id):
+        """Return the path of a ready-to-send response body, or None."""
+        if not self.enabled:
+            return None
+        path = self.response_path(kind, config_id)
+        if os.path.exists(path):
+            return path
+        try:
+            body = self._legacy_body(kind, config_id)
+        except (OSError, ValueError) as e:
+            print(f"Could not read precomputed {kind} artifacts for {config_id}: {e}")
+            return None
+        if body is None:
+            return None
+        write_atomic(path, body)
+        return path
+
+    def store(self, kind, config_id, body):
+        """Write back a freshly computed response body."""
+        if self.enabled:
+            write_atomic(self.response_path(kind, config_id), body)
+
+    def _legacy_body(self, kind, config_id):
+        if kind == "plot":
+            json_path = os.path.join(self.root, "boundary", "json", f"{config_id}.json")
+            if not os.path.exists(json_path):
+                return None
+            with open(json_path) as f:
+                interactive_data = f.read()
+            image = None
+            png_path = os.path.join(self.root, "boundary", "png", f"{config_id}.png")
+            if os.path.exists(png_path):
+                with open(png_path, "rb") as f:
+                    image = base64.b64encode(f.read()).decode("utf-8")
+            return json.dumps({"plot_data": image, "interactive_data": interactive_data}).encode("utf-8")
+
+        if kind == "grid":
+            plot_dir = os.path.join(self.root, "diagnostics", "json", str(config_id))
+            if not os.path.isdir(plot_dir):
+                return None
+            # File names were sanitized ('1/L_grad_B' -> '1_L_grad_B'), so the
+            # real name comes from the trace; write order is the display order
+            entries = sorted(
+                (entry for entry in os.scandir(plot_dir) if entry.name.endswith(".json")),
+                key=lambda entry: entry.stat().st_mtime,
+            )
+            plots = {}
+            for entry in entries:
+                with open(entry.path) as f:
+                    plot_json = f.read()
+                name = json.loads(plot_json)["data"][0].get("name") or entry.name[:-5]
+                plots[name] = plot_json
+            if not plots:
+                return None
+            return json.dumps({"plot_data": None, "interactive_data": plots}).encode("utf-8")
+
+        return None
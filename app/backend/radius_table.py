@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from time import time
+
+
+class RadiusTable:
+    """
+    Persistent memo of the near-axis radius at which get_boundary succeeds
+    for each configuration, or of the fact that none of the radii works
+    (radius NULL).
+
+    Filled by every boundary computation, including the precompute job, so
+    later requests try the right radius first or go straight to the axis
+    fallback. The parameters (render parameters and database version) are
+    recorded with the table; if they change, the memo is cleared. WAL mode
+    lets all workers share the file.
+    """
+
+    def __init__(self, path, params):
+        self.path = path
+        self.params_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS radii (
+                config_id INTEGER PRIMARY KEY,
+                radius REAL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'params_hash'").fetchone()
+            if row is None or row[0] != self.params_hash:
+                if row is not None:
+                    print("Render parameters or database changed, clearing memoized boundary radii")
+                conn.execute("DELETE FROM radii")
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('params_hash', ?)", (self.params_hash,)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def lookup(self, config_id):
+        """Return (known, radius); radius is None when no radius works"""
+        try:
+            row = self._connect().execute(
+                "SELECT radius FROM radii WHERE config_id = ?", (config_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Radius table: lookup failed for {config_id}: {e}")
+            return False, None
+        if row is None:
+            return False, None
+        return True, row[0]
+
+    def record(self, config_id, radius):
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO radii (config_id, radius, updated_at) VALUES (?, ?, ?)",
+                (config_id, radius, time()),
+            )
+        except sqlite3.Error as e:
+            # The memo is an optimization; never fail a render over it
+            print(f"Radius table: could not record {config_id}: {e}")
+
+    def stats(self):
+        conn = self._connect()
+        known, no_radius = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(radius IS NULL), 0) FROM radii"
+        ).fetchone()
+        return {"configs": known, "without_radius": no_radius}
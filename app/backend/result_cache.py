@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from time import time
+
+# Bump this whenever the layout of cached responses changes so stale entries
+# are never served after a deploy.
+CACHE_VERSION = 2
+
+
+def make_cache_key(kind, config, params):
+    """
+    Build a content-addressed key from the endpoint kind, the database row and
+    the render parameters. Any change to one of them yields a new key.
+    """
+    payload = json.dumps(
+        {"version": CACHE_VERSION, "kind": kind, "config": list(config), "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path, data):
+    """Write `data` (bytes) to `path` through a temporary file and a rename."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ResultCache:
+    """
+    Size-bounded on-disk LRU cache for rendered API responses.
+
+    Blobs live under `directory` in files named after their key, and a small
+    SQLite index keeps their sizes and last access times. Blobs are written to
+    a temporary file and renamed into place, and the index runs in WAL mode,
+    so several gunicorn workers can share the same directory safely.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.db")
+        self._local = threading.local()
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    def _connect(self):
+        # One connection per thread (and per process, since workers fork
+        # before the first request opens it)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """Return the cached bytes for `key`, or None on a miss."""
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            self._connect().execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?", (time(), key)
+            )
+        except sqlite3.Error as e:
+            # A busy index must never turn a hit into an error
+            print(f"Result cache: could not update access time for {key}: {e}")
+        return data
+
+    def put(self, key, data):
+        """Store `data` (bytes) under `key` and evict old entries if needed."""
+        write_atomic(self.path_for(key), data)
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+            (key, len(data), time()),
+        )
+        self._evict(conn)
+
+    def _evict(self, conn):
+        # BEGIN IMMEDIATE serializes eviction across workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            evicted = []
+            if total > self.max_bytes:
+                for key, size in conn.execute(
+                    "SELECT key, size FROM entries ORDER BY last_access"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append(key)
+                    total -= size
+                conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in evicted])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for key in evicted:
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        count, total = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
@@ -1,12 +1,20 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, render_template, request, redirect, url_for, jsonify, g
 from flask import send_file
 import io
 import csv
+import functools
+import hashlib
 import os
 from flask_cors import CORS, cross_origin
 import sqlite3
 import jax
 jax.config.update("jax_platform_name", "cpu")
+# Persistent XLA compilation cache, shared by workers and kept across restarts
+# (set STELLARATOR_JAX_CACHE_DIR to an empty string to disable it)
+jax_cache_dir = os.environ.get("STELLARATOR_JAX_CACHE_DIR", os.path.join(os.path.dirname(__file__), "jax_cache"))
+if jax_cache_dir:
+    jax.config.update("jax_compilation_cache_dir", jax_cache_dir)
+    jax.config.update("jax_persistent_cache_min_compile_time_secs", 0)
 try:
     from essos.fields import near_axis as Qsc
     essos_found = True
@@ -24,7 +32,45 @@ import plotly
 import plotly.graph_objects as go
 import json
 import numpy as np
-from time import time
+import struct
+from time import time, sleep
+import threading
+try:
+    from .result_cache import ResultCache, make_cache_key
+    from .precomputed_store import PrecomputedStore
+    from .radius_table import RadiusTable
+    from .single_flight import SingleFlight
+    from .compute_pool import ComputePool, PoolSaturated, JobTimeout
+    from .async_jobs import AsyncJobs
+    from .metrics import Metrics, SIZE_BUCKETS, server_timing
+    from . import compression
+    from .db_pool import ConnectionPool
+    from .config_query import (
+        parse_config_filters, predicates_sql, keyset_predicate, CONFIG_COLUMNS, SORT_FIELDS, RANGE_FIELDS,
+        encode_cursor, decode_cursor, InvalidCursor,
+    )
+    from .column_store import ColumnStore
+    from . import config_export
+    from . import scatter_tiles
+    from . import near_axis_batch
+except ImportError:
+    from result_cache import ResultCache, make_cache_key
+    from precomputed_store import PrecomputedStore
+    from radius_table import RadiusTable
+    from single_flight import SingleFlight
+    from compute_pool import ComputePool, PoolSaturated, JobTimeout
+    from async_jobs import AsyncJobs
+    from metrics import Metrics, SIZE_BUCKETS, server_timing
+    import compression
+    from db_pool import ConnectionPool
+    from config_query import (
+        parse_config_filters, predicates_sql, keyset_predicate, CONFIG_COLUMNS, SORT_FIELDS, RANGE_FIELDS,
+        encode_cursor, decode_cursor, InvalidCursor,
+    )
+    from column_store import ColumnStore
+    import config_export
+    import scatter_tiles
+    import near_axis_batch
 
 # Set the backend to 'Agg' to disable GUI
 matplotlib.use("Agg")
@@ -46,18 +92,258 @@ def set_security_headers(response):
     response.headers['X-XSS-Protection'] = '1; mode=block'
     return response
 
+# Per-request timing, exposed at /metrics; STELLARATOR_SERVER_TIMING=1 also
+# sends the spans of each request in a Server-Timing header
+server_timing_enabled = os.environ.get("STELLARATOR_SERVER_TIMING", "0") == "1"
+
+@app.before_request
+def start_request_timing():
+    g.start_time = time()
+    metrics.start_request()
+
+@app.after_request
+def record_request_timing(response):
+    spans = metrics.finish_request()
+    start_time = g.get("start_time")
+    if start_time is None:
+        return response
+    elapsed = time() - start_time
+    # The route pattern, not the path, keeps the number of series bounded
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.inc("stellarator_requests_total", (("endpoint", endpoint), ("method", request.method), ("status", response.status_code)))
+    metrics.observe("stellarator_request_seconds", elapsed, (("endpoint", endpoint),))
+    if response.content_length is not None:
+        metrics.observe("stellarator_response_bytes", response.content_length, (("endpoint", endpoint),), SIZE_BUCKETS)
+    if server_timing_enabled:
+        response.headers["Server-Timing"] = server_timing(spans, elapsed)
+    return response
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/csv"}
+
+# Registered after the timing hook so it runs first: the recorded response
+# size is what goes over the wire
+@app.after_request
+def compress_response(response):
+    """Compress JSON and text responses that a route has not encoded already"""
+    if "Content-Encoding" not in response.headers:
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        encoding = compression.negotiate(request.accept_encodings, len(body))
+        if encoding is None:
+            return response
+        response.set_data(compression.compress(body, encoding, compression.dynamic_level(encoding, len(body))))
+        response.headers["Content-Encoding"] = encoding
+    # The bytes differ per encoding; a weak ETag stays valid for all of them
+    # (set_validators already sets weak ones)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
 
 nphi = 71
 
+# Boundary rendering parameters used by generate_plot
+radii_to_try = [0.1, 0.05, 0.15, 0.2, 0.025]  # Near-axis radii, tried in order
+ntheta = 30  # Poloidal resolution
+nphi_per_period = 40  # Toroidal resolution per field period
+ntheta_fourier = 20  # Fourier resolution
+mpol = 5  # Number of poloidal modes
+ntor = 5  # Number of toroidal modes
+
+# Persistent result cache shared by all gunicorn workers
+result_cache = ResultCache(
+    os.environ.get("STELLARATOR_CACHE_DIR", os.path.join(os.path.dirname(__file__), "cache")),
+    int(os.environ.get("STELLARATOR_CACHE_MAX_BYTES", 2 * 1024**3)),
+)
+
+# Counters and timing histograms of every worker and compute process
+metrics = Metrics(os.environ.get("STELLARATOR_METRICS_DIR", os.path.join(result_cache.directory, "metrics")))
+
+# Coalesces concurrent renders of the same cache key across threads and workers
+single_flight = SingleFlight(os.path.join(result_cache.directory, "locks"))
+
+# Background render jobs started through POST /api/plot/<id>/jobs
+async_jobs = AsyncJobs(os.path.join(result_cache.directory, "jobs.db"))
+
+# Qsc construction and rendering run in a separate bounded process pool, so
+# slow configurations cannot tie up the request threads
+# (STELLARATOR_COMPUTE_POOL=0 renders inline instead)
+compute_pool = None
+if os.environ.get("STELLARATOR_COMPUTE_POOL", "1") != "0":
+    compute_workers = int(os.environ.get("STELLARATOR_COMPUTE_WORKERS", 2))
+    compute_pool = ComputePool(
+        compute_workers,
+        int(os.environ.get("STELLARATOR_COMPUTE_QUEUE", 4 * compute_workers)),
+        float(os.environ.get("STELLARATOR_COMPUTE_TIMEOUT", 120)),
+        span_sink=metrics.add_request_spans,
+    )
+
+def render_params():
+    """Parameters that influence the rendered output, used in cache keys"""
+    return {
+        "backend": "essos" if essos_found else "qsc",
+        "nphi": nphi,
+        "radii": radii_to_try,
+        "ntheta": ntheta,
+        "nphi_per_period": nphi_per_period,
+        "ntheta_fourier": ntheta_fourier,
+        "mpol": mpol,
+        "ntor": ntor,
+    }
+
+# Read-only SQLite connections, one per thread, reused across requests
+db_pool = ConnectionPool(os.environ.get("STELLARATOR_DB", os.path.join(os.path.dirname(__file__), "XGStels.db")))
+
+# The database is opened immutable, so its version is fixed for the life of
+# the worker; it is part of the validators of every response derived from it
+try:
+    db_stat = os.stat(db_pool.db_path)
+    db_version = f"{db_stat.st_mtime_ns:x}-{db_stat.st_size:x}"
+    db_last_modified = int(db_stat.st_mtime)
+except FileNotFoundError:
+    db_version, db_last_modified = "missing", None
+
+# Artifacts written by precomputation.py, served before any live computation
+precomputed_store = PrecomputedStore(
+    os.environ.get("STELLARATOR_PRECOMPUTED_DIR", os.path.join(os.path.dirname(__file__), "precomputed")),
+    render_params(),
+    db_version,
+)
+
+# Memoized working radius per configuration, shared with precomputation.py.
+# A rebuilt database can hold a different configuration under the same id,
+# so the database version is part of the memo's parameters
+radius_table = RadiusTable(
+    os.environ.get("STELLARATOR_RADIUS_DB", os.path.join(precomputed_store.root, "radii.db")),
+    dict(render_params(), db_version=db_version),
+)
+
+def set_validators(response, etag):
+    # Weak, so 200s in any content coding and 304s all carry the same validator
+    response.set_etag(etag, weak=True)
+    response.last_modified = db_last_modified
+
+def early_not_modified(etag):
+    """A 304 if the client already holds `etag`, so the body is not even computed"""
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+        set_validators(response, etag)
+        return response
+    return None
+
+@functools.lru_cache(maxsize=64)
+def memory_variant(body, encoding):
+    """Compressed copy of a body that is itself cached in this process"""
+    return compression.compress(body, encoding, compression.CACHED_LEVELS[encoding])
+
+def result_cache_variant(key, body, encoding):
+    """Compressed copy of a result cache entry, stored in the cache next to it"""
+    variant_key = key + compression.SUFFIXES[encoding]
+    data = result_cache.get(variant_key)
+    if data is None:
+        data = compression.compress(body, encoding, compression.CACHED_LEVELS[encoding])
+        result_cache.put(variant_key, data)
+    return data
+
+def encoded_response(body, variant, mimetype="application/json"):
+    """
+    `body` in the encoding the client prefers, taken from variant(encoding)
+    so stored compressed copies are reused
+    """
+    encoding = compression.negotiate(request.accept_encodings, len(body))
+    response = app.response_class(body if encoding is None else variant(encoding), mimetype=mimetype)
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+def send_stored_file(path, mimetype="application/json"):
+    """send_file for a stored body, using (or writing) a precompressed variant next to it"""
+    encoding = compression.negotiate(request.accept_encodings, os.path.getsize(path))
+    if encoding is not None:
+        try:
+            path = compression.precompressed_file(path, encoding)
+        except OSError as e:
+            print(f"Could not write {encoding} variant of {path}: {e}")
+            encoding = None
+    # Validators are set by the caller
+    response = send_file(path, mimetype=mimetype, etag=False, conditional=False)
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
 # Connect to SQLite database
 def connect_db():
-    db_path = os.path.join(os.path.dirname(__file__), "XGStels.db")
-    return sqlite3.connect(db_path)  # Path to your SQLite database file  
+    # Pooled connection: do not close it
+    return db_pool.connection()
+
+def load_column_store():
+    """
+    Memory-map the columnar snapshot of XGStels used for filtering and
+    sorting. Falls back to SQLite (None) if it is disabled or cannot be built.
+    """
+    if os.environ.get("STELLARATOR_COLUMN_STORE", "1") == "0":
+        return None
+    snapshot_dir = os.environ.get(
+        "STELLARATOR_SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "snapshot")
+    )
+    try:
+        start_time = time()
+        store = ColumnStore.open(db_pool.db_path, snapshot_dir)
+        print(f"Loading column store took {time() - start_time:.2f} seconds")
+        return store
+    except Exception as e:
+        print(f"Column store unavailable, using SQLite: {e}")
+        return None
+
+column_store = load_column_store()
+
+# The table never changes while the app runs, so this is looked up once
+@functools.lru_cache(maxsize=None)
+def max_config_id():
+    return connect_db().execute("SELECT MAX(id) FROM XGStels").fetchone()[0]
+
+@functools.lru_cache(maxsize=4096)
+def count_configs(where_sql, params):
+    query = "SELECT COUNT(*) FROM XGStels"
+    if where_sql:
+        query += " WHERE " + where_sql
+    with metrics.span("db_query"):
+        return connect_db().execute(query, params).fetchone()[0]
+
+def query_configs(predicates, sort_field, sort_order, offset, limit):
+    """One page of /api/configs rows from SQLite"""
+    where_clauses, params = predicates_sql(predicates)
+    data_query = f"SELECT {', '.join(CONFIG_COLUMNS)} FROM XGStels"
+    # Combine the WHERE clause if needed
+    if where_clauses:
+        data_query += " WHERE " + " AND ".join(where_clauses)
+
+    # Explicit order: filters may be answered from an index, so row order is
+    # no longer implicitly by id
+    if sort_field == "id":
+        data_query += f" ORDER BY id {sort_order}"
+    else:
+        data_query += f" ORDER BY {sort_field} {sort_order}, id {sort_order}"
+    data_query += " LIMIT ? OFFSET ?"
+    with metrics.span("db_query"):
+        return connect_db().execute(data_query, params + [limit, offset]).fetchall()
 
 # Modified API endpoint to support pagination and search
 @app.route("/api/configs", methods=["GET"])
 @cross_origin()
 def get_configs():
+    # The same query against the same database returns the same page
+    etag = hashlib.sha256(f"{db_version}?{request.query_string.decode('utf-8', 'replace')}".encode("utf-8")).hexdigest()
+    not_modified = early_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
     # Get query parameters for pagination and search
     page = request.args.get("page", default=1, type=int)
     limit = request.args.get("limit", default=500, type=int)
@@ -66,193 +352,45 @@ def get_configs():
     page = max(1, min(page, 10000))  # Page must be between 1 and 10000
     limit = max(1, min(limit, 1000))  # Limit must be between 1 and 1000
 
-    # Existing individual search parameters
-    search_rc1 = request.args.get("search_rc1", default="", type=str)
-    search_rc2 = request.args.get("search_rc2", default="", type=str)
-    search_rc3 = request.args.get("search_rc3", default="", type=str)
-    search_zs1 = request.args.get("search_zs1", default="", type=str)
-    search_zs2 = request.args.get("search_zs2", default="", type=str)
-    search_zs3 = request.args.get("search_zs3", default="", type=str)
-    search_nfp = request.args.get("search_nfp", default="", type=str)
-    search_etabar = request.args.get("search_etabar", default="", type=str)
-    search_B2c = request.args.get("search_B2c", default="", type=str)
-    search_p2 = request.args.get("search_p2", default="", type=str)
-    search_iota = request.args.get("search_iota", default="", type=str)
-    search_beta= request.args.get("search_beta", default="", type=str)
-    search_DMerc_times_r2= request.args.get("search_DMerc_times_r2", default="", type=str)
-    search_min_L_grad_B= request.args.get("search_min_L_grad_B", default="", type=str)
-    search_r_singularity= request.args.get("search_r_singularity", default="", type=str)
-    search_B20_variation= request.args.get("search_B20_variation", default="", type=str)
-    search_id = request.args.get("search_id", default="", type=str)
-
-    # Range filter parameters (min/max for sliders)
-    iota_min = request.args.get("iota_min", default=None, type=float)
-    iota_max = request.args.get("iota_max", default=None, type=float)
-    beta_min = request.args.get("beta_min", default=None, type=float)
-    beta_max = request.args.get("beta_max", default=None, type=float)
-    r_singularity_min = request.args.get("r_singularity_min", default=None, type=float)
-    r_singularity_max = request.args.get("r_singularity_max", default=None, type=float)
-    etabar_min = request.args.get("etabar_min", default=None, type=float)
-    etabar_max = request.args.get("etabar_max", default=None, type=float)
-    B2c_min = request.args.get("B2c_min", default=None, type=float)
-    B2c_max = request.args.get("B2c_max", default=None, type=float)
-    rc1_min = request.args.get("rc1_min", default=None, type=float)
-    rc1_max = request.args.get("rc1_max", default=None, type=float)
-    rc2_min = request.args.get("rc2_min", default=None, type=float)
-    rc2_max = request.args.get("rc2_max", default=None, type=float)
-    zs1_min = request.args.get("zs1_min", default=None, type=float)
-    zs1_max = request.args.get("zs1_max", default=None, type=float)
-    zs2_min = request.args.get("zs2_min", default=None, type=float)
-    zs2_max = request.args.get("zs2_max", default=None, type=float)
-
-    # Get filter parameters from MUI DataGrid
-    filter_value = request.args.get("filter", default="", type=str)
-    filter_field = request.args.get("filter_field", default="", type=str)
-
     offset = (page - 1) * limit
 
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    # Base queries
-    count_query = "SELECT COUNT(*) FROM XGStels"
-    data_query = "SELECT id, rc1, rc2, rc3, zs1, zs2, zs3, nfp, etabar, B2c, p2, iota, beta, DMerc_times_r2, min_L_grad_B, r_singularity, B20_variation FROM XGStels"
-    where_clauses = []
-    params = []
-
-    # Search by ID (partial matching)
-    if search_id:
-        where_clauses.append("CAST(id AS TEXT) LIKE ?")
-        params.append(f"%{search_id}%")
-
-    # Existing individual search parameters (AND logic)
-    if search_rc1:
-        where_clauses.append("rc1 LIKE ?")
-        params.append(f"%{search_rc1}%")
-    if search_rc2:
-        where_clauses.append("rc2 LIKE ?")
-        params.append(f"%{search_rc2}%")
-    if search_rc3:
-        where_clauses.append("rc3 LIKE ?")
-        params.append(f"%{search_rc3}%")
-    if search_zs1:
-        where_clauses.append("zs1 LIKE ?")
-        params.append(f"%{search_zs1}%")
-    if search_zs2:
-        where_clauses.append("zs2 LIKE ?")
-        params.append(f"%{search_zs2}%")
-    if search_zs3:
-        where_clauses.append("zs3 LIKE ?")
-        params.append(f"%{search_zs3}%")
-    if search_nfp:
-        where_clauses.append("nfp LIKE ?")
-        params.append(f"%{search_nfp}%")
-    if search_etabar:
-        where_clauses.append("etabar LIKE ?")
-        params.append(f"%{search_etabar}%")
-    if search_B2c:
-        where_clauses.append("B2c LIKE ?")
-        params.append(f"%{search_B2c}%")
-    if search_p2:
-        where_clauses.append("p2 LIKE ?")
-        params.append(f"%{search_p2}%")
-    if search_iota:
-        where_clauses.append("iota LIKE ?")
-        params.append(f"%{search_iota}%")
-    if search_beta:
-        where_clauses.append("beta LIKE ?")
-        params.append(f"%{search_beta}%")
-    if search_DMerc_times_r2:
-        where_clauses.append("DMerc_times_r2 LIKE ?")
-        params.append(f"%{search_DMerc_times_r2}%")
-    if search_min_L_grad_B:
-        where_clauses.append("min_L_grad_B LIKE ?")
-        params.append(f"%{search_min_L_grad_B}%")
-    if search_r_singularity:
-        where_clauses.append("r_singularity LIKE ?")
-        params.append(f"%{search_r_singularity}%")
-    if search_B20_variation:
-        where_clauses.append("B20_variation LIKE ?")
-        params.append(f"%{search_B20_variation}%")
-
-    # Range filters (min/max from sliders)
-    if iota_min is not None:
-        where_clauses.append("iota >= ?")
-        params.append(iota_min)
-    if iota_max is not None:
-        where_clauses.append("iota <= ?")
-        params.append(iota_max)
-    if beta_min is not None:
-        where_clauses.append("beta >= ?")
-        params.append(beta_min)
-    if beta_max is not None:
-        where_clauses.append("beta <= ?")
-        params.append(beta_max)
-    if r_singularity_min is not None:
-        where_clauses.append("r_singularity >= ?")
-        params.append(r_singularity_min)
-    if r_singularity_max is not None:
-        where_clauses.append("r_singularity <= ?")
-        params.append(r_singularity_max)
-    if etabar_min is not None:
-        where_clauses.append("etabar >= ?")
-        params.append(etabar_min)
-    if etabar_max is not None:
-        where_clauses.append("etabar <= ?")
-        params.append(etabar_max)
-    if B2c_min is not None:
-        where_clauses.append("B2c >= ?")
-        params.append(B2c_min)
-    if B2c_max is not None:
-        where_clauses.append("B2c <= ?")
-        params.append(B2c_max)
-    if rc1_min is not None:
-        where_clauses.append("rc1 >= ?")
-        params.append(rc1_min)
-    if rc1_max is not None:
-        where_clauses.append("rc1 <= ?")
-        params.append(rc1_max)
-    if rc2_min is not None:
-        where_clauses.append("rc2 >= ?")
-        params.append(rc2_min)
-    if rc2_max is not None:
-        where_clauses.append("rc2 <= ?")
-        params.append(rc2_max)
-    if zs1_min is not None:
-        where_clauses.append("zs1 >= ?")
-        params.append(zs1_min)
-    if zs1_max is not None:
-        where_clauses.append("zs1 <= ?")
-        params.append(zs1_max)
-    if zs2_min is not None:
-        where_clauses.append("zs2 >= ?")
-        params.append(zs2_min)
-    if zs2_max is not None:
-        where_clauses.append("zs2 <= ?")
-        params.append(zs2_max)
-
-    # Apply the DataGrid filter
-    allowed_fields = {"rc1", "rc2", "rc3", "zs1", "zs2", "zs3", "nfp", "etabar", "B2c", "p2", "iota", "beta", "DMerc_times_r2", "min_L_grad_B", "r_singularity", "B20_variation"}
-    if filter_field and filter_field in allowed_fields and filter_value:
-        where_clauses.append(f"{filter_field} LIKE ?")
-        params.append(f"%{filter_value}%")
+    # Sorting; id breaks ties so every row has a unique position
+    sort_field = request.args.get("sort_field", default="id", type=str)
+    sort_order = request.args.get("sort_order", default="asc", type=str).lower()
+    if sort_field not in SORT_FIELDS or sort_order not in ("asc", "desc"):
+        return jsonify({"error": "Unsupported sort"}), 400
 
-    # Combine the WHERE clause if needed
-    if where_clauses:
-        clause = " WHERE " + " AND ".join(where_clauses)
-        count_query += clause
-        data_query += clause
+    # Keyset pagination: pagination=cursor (first page) or cursor=<next_cursor>
+    page_cursor = request.args.get("cursor", default="", type=str)
+    use_cursor = bool(page_cursor) or request.args.get("pagination", default="offset", type=str) == "cursor"
+    # count=none skips the count entirely
+    want_count = request.args.get("count", default="exact", type=str) != "none"
 
-    # First, get total count
-    cursor.execute(count_query, params)
-    count = cursor.fetchone()[0]
-    totalPages = max(1, -(-count // limit))  # Ceiling division
+    predicates = parse_config_filters(request.args, max_config_id())
+    keyset = []
+    if page_cursor:
+        try:
+            value, last_id = decode_cursor(page_cursor, sort_field, sort_order)
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        keyset = [keyset_predicate(sort_field, sort_order, value, last_id)]
+    if use_cursor:
+        offset = 0
 
-    # Query the paginated records
-    data_query += " LIMIT ? OFFSET ?"
-    cursor.execute(data_query, params + [limit, offset])
-    rows = cursor.fetchall()
-    conn.close()
+    # The column store answers everything except LIKE searches
+    if column_store is not None and column_store.supports(predicates):
+        mask = column_store.mask(predicates)
+        count = int(mask.sum()) if want_count else None
+        if keyset:
+            mask &= column_store.mask(keyset)
+        rows = column_store.rows(column_store.select(mask, sort_field, sort_order, offset, limit))
+    else:
+        where_clauses, params = predicates_sql(predicates)
+        # The count depends only on the filters, so it is cached per filter set
+        count = count_configs(" AND ".join(where_clauses), tuple(params)) if want_count else None
+        rows = query_configs(predicates + keyset, sort_field, sort_order, offset, limit)
+    totalPages = max(1, -(-count // limit)) if want_count else None  # Ceiling division
+    next_cursor = encode_cursor(sort_field, sort_order, rows[-1]) if len(rows) == limit else None
 
     data = {
         "configs": [
@@ -268,7 +406,7 @@ def get_configs():
                 "etabar": row[8],
                 "B2c": row[9],
                 "p2": row[10],
-                "iota": np.abs(row[11]),
+                "iota": abs(row[11]) if row[11] is not None else None,
                 "beta": row[12],
                 "DMerc_times_r2": row[13],
                 "min_L_grad_B": row[14],
@@ -277,16 +415,24 @@ def get_configs():
             } for row in rows
         ],
         "totalPages": totalPages,
-        "count": count
+        "count": count,
+        "next_cursor": next_cursor
     }
     jsonified_data = jsonify(data)
-    return jsonified_data
+    set_validators(jsonified_data, etag)
+    # Revalidate every time; an unchanged page costs a 304
+    jsonified_data.headers["Cache-Control"] = "no-cache"
+    return jsonified_data.make_conditional(request)
 
 
-@app.route("/api/ranges", methods=["GET"])
-@cross_origin()
-def get_ranges():
-    """Get min/max ranges for all numeric parameters (for slider bounds)"""
+def compute_ranges():
+    """Min/max per slider column, for databases built before XGStels_stats existed"""
+    if column_store is not None:
+        return {
+            field: dict(zip(("min", "max"), column_store.min_max(field)))
+            for field in RANGE_FIELDS
+        }
+
     conn = connect_db()
     cursor = conn.cursor()
     cursor.execute("""
@@ -303,9 +449,8 @@ def get_ranges():
         FROM XGStels
     """)
     row = cursor.fetchone()
-    conn.close()
 
-    return jsonify({
+    return {
         "iota": {"min": row[0], "max": row[1]},
         "beta": {"min": row[2], "max": row[3]},
         "r_singularity": {"min": row[4], "max": row[5]},
@@ -315,34 +460,132 @@ def get_ranges():
         "rc2": {"min": row[12], "max": row[13]},
         "zs1": {"min": row[14], "max": row[15]},
         "zs2": {"min": row[16], "max": row[17]}
-    })
+    }
 
+@functools.lru_cache(maxsize=None)
+def range_responses():
+    """
+    Response bodies and ETags for /api/ranges, built once per worker from the
+    XGStels_stats table written by xgstels.py. Returns {detail: (body, etag)}.
+    """
+    try:
+        rows = connect_db().execute(
+            "SELECT column_name, min, max, count, quantiles, histogram FROM XGStels_stats"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        print("XGStels_stats not found, computing ranges from the table (run xgstels.py --metadata-only)")
+        rows = None
 
-@app.route("/api/scatter", methods=["GET"])
+    if rows:
+        stats = {row[0]: row for row in rows}
+        basic = {field: {"min": stats[field][1], "max": stats[field][2]} for field in RANGE_FIELDS}
+        full = {
+            name: {
+                "min": row[1],
+                "max": row[2],
+                "count": row[3],
+                "quantiles": json.loads(row[4]) if row[4] else None,
+                "histogram": json.loads(row[5]) if row[5] else None,
+            }
+            for name, row in stats.items()
+        }
+    else:
+        basic = full = compute_ranges()
+
+    responses = {}
+    for detail, data in (("basic", basic), ("full", full)):
+        body = json.dumps(data, sort_keys=True).encode("utf-8")
+        responses[detail] = (body, hashlib.sha256(body).hexdigest()[:32])
+    return responses
+
+@app.route("/api/ranges", methods=["GET"])
 @cross_origin()
-def get_scatter_data():
-    """Get lightweight data for scatter plots (sampled configs, plottable fields)"""
-    # Limit points per NFP for performance (default 2000 per NFP = 10k total max)
-    max_per_nfp = request.args.get("limit", default=2000, type=int)
-    max_per_nfp = max(100, min(max_per_nfp, 10000))  # Bound between 100-10000
+def get_ranges():
+    """
+    Get min/max ranges for all numeric parameters (for slider bounds).
+    detail=full adds count, quantiles and a histogram for every searchable column.
+    """
+    detail = "full" if request.args.get("detail", default="", type=str) == "full" else "basic"
+    body, etag = range_responses()[detail]
+    response = encoded_response(body, lambda encoding: memory_variant(body, encoding))
+    set_validators(response, etag)
+    # The statistics only change when the database is rebuilt; revalidating
+    # on every use picks up a rebuild at the cost of a 304
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
-    conn = connect_db()
-    cursor = conn.cursor()
 
-    # Group by NFP for easier frontend processing
-    result = {1: [], 2: [], 3: [], 4: [], 5: []}
+SCATTER_COLUMNS = ["id", "nfp", "iota", "beta", "r_singularity", "etabar", "B2c", "rc1", "rc2", "zs1", "zs2"]
 
-    # Fetch sampled data for each NFP separately for better distribution
-    for nfp_val in [1, 2, 3, 4, 5]:
-        cursor.execute("""
-            SELECT id, nfp, iota, beta, r_singularity, etabar, B2c, rc1, rc2, zs1, zs2
+@functools.lru_cache(maxsize=None)
+def has_sample_rank():
+    """Databases built by older versions of xgstels.py lack sample_rank"""
+    columns = [row[1] for row in connect_db().execute("PRAGMA table_info(XGStels)")]
+    return "sample_rank" in columns
+
+@functools.lru_cache(maxsize=None)
+def nfp_group_size(nfp_val):
+    return connect_db().execute("SELECT COUNT(*) FROM XGStels WHERE nfp = ?", (nfp_val,)).fetchone()[0]
+
+def sample_start(seed, group_size):
+    # Each seed starts at a different point of the stored random permutation
+    return (seed * 2654435761) % group_size if group_size else 0
+
+def sample_scatter_rows(nfp_val, limit, seed=0):
+    """
+    Reproducible random sample of up to `limit` rows with the given nfp:
+    the rows whose sample_rank falls in [start, start + limit), wrapping
+    around the group, in rank order.
+    """
+    if column_store is not None:
+        in_group = column_store.columns["nfp"] == nfp_val
+        positions = np.flatnonzero(in_group)
+        if "sample_rank" in column_store.columns:
+            group_size = len(positions)
+            start = sample_start(seed, group_size)
+            shifted = (np.asarray(column_store.columns["sample_rank"][positions]).astype(np.int64) - start) % max(group_size, 1)
+            order = np.argsort(shifted, kind="stable")[:limit]
+            positions = positions[order]
+        else:
+            positions = np.random.default_rng(seed).permutation(positions)[:limit]
+        return column_store.rows(positions, SCATTER_COLUMNS)
+
+    cursor = connect_db().cursor()
+    columns = ', '.join(SCATTER_COLUMNS)
+    if not has_sample_rank():
+        # Deterministic pseudo-random order; still a full sort of the group
+        cursor.execute(f"""
+            SELECT {columns}
             FROM XGStels
             WHERE nfp = ?
-            ORDER BY RANDOM()
+            ORDER BY (id * 2654435761 + ?) % 4294967296
             LIMIT ?
-        """, (nfp_val, max_per_nfp))
+        """, (nfp_val, seed, limit))
+        return cursor.fetchall()
 
-        rows = cursor.fetchall()
+    # Two index range reads on (nfp, sample_rank)
+    group_size = nfp_group_size(nfp_val)
+    start = sample_start(seed, group_size)
+    query = f"""
+        SELECT {columns}
+        FROM XGStels
+        WHERE nfp = ? AND sample_rank >= ? AND sample_rank < ?
+        ORDER BY sample_rank
+    """
+    rows = cursor.execute(query, (nfp_val, start, start + limit)).fetchall()
+    if len(rows) < limit and start > 0:
+        rows += cursor.execute(query, (nfp_val, 0, min(start, limit - len(rows)))).fetchall()
+    return rows
+
+@functools.lru_cache(maxsize=64)
+def scatter_response(max_per_nfp, seed):
+    """Response body and ETag for /api/scatter; deterministic, so cached per worker"""
+    # Group by NFP for easier frontend processing
+    result = {1: [], 2: [], 3: [], 4: [], 5: []}
+
+    # Fetch sampled data for each NFP separately for better distribution
+    for nfp_val in [1, 2, 3, 4, 5]:
+        rows = sample_scatter_rows(nfp_val, max_per_nfp, seed)
         for row in rows:
             config_id, nfp, iota, beta, r_sing, etabar, B2c, rc1, rc2, zs1, zs2 = row
             result[nfp_val].append({
@@ -358,8 +601,116 @@ def get_scatter_data():
                 "zs2": zs2 or 0
             })
 
-    conn.close()
-    return jsonify(result)
+    body = json.dumps(result, sort_keys=True).encode("utf-8")
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+@app.route("/api/scatter", methods=["GET"])
+@cross_origin()
+def get_scatter_data():
+    """
+    Get lightweight data for scatter plots (sampled configs, plottable fields).
+    The sample is fixed for a given limit and seed, so responses are cacheable.
+    """
+    # Limit points per NFP for performance (default 2000 per NFP = 10k total max)
+    max_per_nfp = request.args.get("limit", default=2000, type=int)
+    max_per_nfp = max(100, min(max_per_nfp, 10000))  # Bound between 100-10000
+    seed = request.args.get("seed", default=0, type=int)
+
+    body, etag = scatter_response(max_per_nfp, seed)
+    response = encoded_response(body, lambda encoding: memory_variant(body, encoding))
+    set_validators(response, etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@functools.lru_cache(maxsize=None)
+def tile_column(field):
+    """Whole column as float64 (|iota| for iota), NaN for NULL"""
+    if column_store is not None:
+        values = column_store.columns[field]
+    else:
+        rows = connect_db().execute(f"SELECT {field} FROM XGStels ORDER BY id").fetchall()
+        values = [np.nan if row[0] is None else row[0] for row in rows]
+    return scatter_tiles.axis_values(values, field)
+
+@functools.lru_cache(maxsize=None)
+def tile_keys():
+    """(ids, nfps) aligned with tile_column"""
+    if column_store is not None:
+        return np.asarray(column_store.columns["id"]), np.asarray(column_store.columns["nfp"]).astype(np.int64)
+    rows = connect_db().execute("SELECT id, nfp FROM XGStels ORDER BY id").fetchall()
+    return (
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([-1 if row[1] is None else row[1] for row in rows], dtype=np.int64),
+    )
+
+@functools.lru_cache(maxsize=None)
+def tile_domain(field):
+    return scatter_tiles.domain(tile_column(field))
+
+@functools.lru_cache(maxsize=4096)
+def scatter_tile_response(x_field, y_field, zoom, tx, ty, nfp, bins, max_points):
+    """Response body and ETag for one scatter tile, or None if the tile does not exist"""
+    x_domain, y_domain = tile_domain(x_field), tile_domain(y_field)
+    tiles = 2**zoom
+    if not (0 <= tx < tiles and 0 <= ty < tiles):
+        return None
+    if x_domain is None or y_domain is None:
+        # A column with no values at all (e.g. B2c in first-order datasets)
+        x_domain, y_domain = x_domain or [0.0, 1.0], y_domain or [0.0, 1.0]
+    x_bounds = scatter_tiles.tile_bounds(x_domain, zoom, tx)
+    y_bounds = scatter_tiles.tile_bounds(y_domain, zoom, ty)
+
+    ids, nfps = tile_keys()
+    x, y = tile_column(x_field), tile_column(y_field)
+    mask = scatter_tiles.tile_mask(x, x_bounds, tx == tiles - 1)
+    mask &= scatter_tiles.tile_mask(y, y_bounds, ty == tiles - 1)
+    if nfp is not None:
+        mask &= nfps == nfp
+    positions = np.flatnonzero(mask)
+
+    result = scatter_tiles.aggregate_tile(
+        ids[positions], nfps[positions], x[positions], y[positions], x_bounds, y_bounds, bins, max_points
+    )
+    result.update({
+        "x_field": x_field,
+        "y_field": y_field,
+        "zoom": zoom,
+        "tx": tx,
+        "ty": ty,
+        "nfp": nfp,
+        "bounds": {"x": x_bounds, "y": y_bounds},
+        "domain": {"x": x_domain, "y": y_domain},
+    })
+    body = json.dumps(result, sort_keys=True).encode("utf-8")
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+@app.route("/api/scatter/tiles/<x_field>/<y_field>/<int:zoom>/<int:tx>/<int:ty>", methods=["GET"])
+@cross_origin()
+def get_scatter_tile(x_field, y_field, zoom, tx, ty):
+    """
+    Level-of-detail view of all configurations for one pair of columns.
+    Tile (tx, ty) at `zoom` covers 1/2**zoom of each axis domain; dense
+    tiles come back as binned counts, sparse ones as the points themselves.
+    """
+    if x_field not in scatter_tiles.TILE_FIELDS or y_field not in scatter_tiles.TILE_FIELDS:
+        return jsonify({"error": f"Fields must be among {scatter_tiles.TILE_FIELDS}"}), 400
+    if zoom > scatter_tiles.MAX_ZOOM:
+        return jsonify({"error": f"zoom must be at most {scatter_tiles.MAX_ZOOM}"}), 400
+    nfp = request.args.get("nfp", default=None, type=int)
+    bins = request.args.get("bins", default=scatter_tiles.DEFAULT_BINS, type=int)
+    bins = max(8, min(bins, 256))
+    max_points = request.args.get("max_points", default=scatter_tiles.DEFAULT_MAX_POINTS, type=int)
+    max_points = max(0, min(max_points, 10000))
+
+    tile = scatter_tile_response(x_field, y_field, zoom, tx, ty, nfp, bins, max_points)
+    if tile is None:
+        return jsonify({"error": "Tile out of range"}), 404
+    body, etag = tile
+    response = encoded_response(body, lambda encoding: memory_variant(body, encoding))
+    set_validators(response, etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
 
 # Function to fetch configurations from the SQLite database
@@ -370,7 +721,6 @@ def fetch_configs():
         "SELECT id, rc1, rc2, rc3, zs1, zs2, zs3, nfp, etabar, B2c, p2, axis_length, iota FROM XGStels"
     )
     rows = cursor.fetchall()
-    conn.close()
     return rows
 
 # Function to safely access attributes
@@ -387,133 +737,217 @@ def determine_order(config):
         return "r3"
     return "r1"  # Default to r1 if detection of B2c fails or using ESSOS
 
-# Modified function to generate plot data for interactive visualization
-def generate_plot(stel, config_id):
-    try:
-        # --------------------------------------------------
-        # Instead of using stel.plot(), use get_boundary() to get the 3D boundary data
-        # --------------------------------------------------
-        r = 0.1  # near-axis radius
-        
-        # Try different radii if the default fails
-        radii_to_try = [0.1, 0.05, 0.15, 0.2, 0.025]
-        success = False
-        
-        for r in radii_to_try:
-            try:
-                ntheta = 30  # Poloidal resolution
-                nphi_plot = stel.nfp*2*20   # Toroidal resolution
-                ntheta_fourier = 20  # Fourier resolution
-                mpol = 5  # Number of poloidal modes
-                ntor = 5  # Number of toroidal modes
-                
-                # Get the boundary data
-                start_time = time()
+def compute_boundary(stel, config_id=None):
+    """
+    Solve for the 3D boundary, trying the radii in radii_to_try in order.
+    Returns (r, x_2D, y_2D, z_2D, Bmag) on a (ntheta, nfp*nphi_per_period)
+    grid, or None if the root finder fails for every radius.
+
+    With a config_id, the outcome is memoized in radius_table: the working
+    radius is tried first next time, and a configuration for which no
+    radius works returns None without any solve.
+    """
+    # --------------------------------------------------
+    # Instead of using stel.plot(), use get_boundary() to get the 3D boundary data
+    # --------------------------------------------------
+    nphi_plot = stel.nfp*nphi_per_period   # Toroidal resolution
+
+    known, known_radius = radius_table.lookup(config_id) if config_id is not None else (False, None)
+    if known and known_radius is None:
+        print(f"No radius works for config {config_id} (memoized), skipping boundary")
+        return None
+    candidates = radii_to_try
+    if known:
+        candidates = [known_radius] + [r for r in radii_to_try if r != known_radius]
+
+    for r in candidates:
+        try:
+            # Get the boundary data
+            start_time = time()
+            with metrics.span("get_boundary"):
                 x_2D_plot, y_2D_plot, z_2D_plot, R_2D = stel.get_boundary(
                     r=r, ntheta=ntheta, nphi=nphi_plot, ntheta_fourier=ntheta_fourier,
                     mpol=mpol, ntor=ntor
                 )
-                print(f"Getting boundary data took {time() - start_time:.2f} seconds")
-                success = True
-                break  # Break out of the loop if successful
-            except ValueError as e:
-                if "f(a) and f(b) must have different signs" in str(e):
-                    print(f"Failed with radius {r}, trying next value")
-                    continue
-                else:
-                    raise  # Re-raise if it's a different ValueError
+            print(f"Getting boundary data took {time() - start_time:.2f} seconds")
+            break  # Break out of the loop if successful
+        except ValueError as e:
+            if "f(a) and f(b) must have different signs" in str(e):
+                print(f"Failed with radius {r}, trying next value")
+                continue
+            else:
+                raise  # Re-raise if it's a different ValueError
+    else:
+        if config_id is not None:
+            radius_table.record(config_id, None)
+        return None
+    if config_id is not None and r != known_radius:
+        radius_table.record(config_id, r)
+
+    # Get the magnetic field strength on the surface for coloring
+    theta1D = np.linspace(0, 2 * np.pi, ntheta)
+    phi1D = np.linspace(0, 2 * np.pi, nphi_plot)
+    phi2D, theta2D = np.meshgrid(phi1D, theta1D)
+    with metrics.span("b_mag"):
+        Bmag = stel.B_mag(r, theta2D, phi2D)
+    return r, x_2D_plot, y_2D_plot, z_2D_plot, Bmag
+
+def plotly_typed_array(array):
+    """Encode an array as a Plotly typed array spec (base64 float32)"""
+    array = np.ascontiguousarray(array, dtype="<f4")
+    return {
+        "dtype": "f4",
+        "bdata": base64.b64encode(array.tobytes()).decode("ascii"),
+        "shape": ", ".join(str(n) for n in array.shape),
+    }
+
+def plotly_surface_figure(x_2D_plot, y_2D_plot, z_2D_plot, Bmag, config_id, typed=False):
+    """
+    Plotly figure dict for the boundary surface. With typed=True the arrays
+    are sent as base64 typed arrays, which plotly.js decodes natively.
+    """
+    encode = plotly_typed_array if typed else (lambda array: np.asarray(array).tolist())
+    return {
+        "data": [{
+            "type": "surface",
+            "x": encode(x_2D_plot),
+            "y": encode(y_2D_plot),
+            "z": encode(z_2D_plot),
+            "surfacecolor": encode(Bmag),
+            "colorscale": "Viridis",
+            "colorbar": {"title": "|B| [T]"},
+            "showscale": True
+        }],
+        "layout": {
+            "title": f"Stellarator Configuration {config_id}",
+            "autosize": True,
+            "scene": {
+                "xaxis": {"visible": False},
+                "yaxis": {"visible": False},
+                "zaxis": {"visible": False},
+                "aspectmode": "data"
+            },
+            "margin": {"l": 0, "r": 0, "b": 0, "t": 30},
+            "paper_bgcolor": "rgb(240, 240, 240)"
+        }
+    }
+
+# Binary surface layout: little-endian header (magic, version, number of
+# arrays, ntheta, nphi, radius) followed by x, y, z and |B| as float32 arrays
+# in row-major (ntheta, nphi) order. The header is 20 bytes, so the arrays
+# start 4-byte aligned and can be viewed with a Float32Array directly.
+SURFACE_MAGIC = b"STLS"
+SURFACE_VERSION = 1
+SURFACE_HEADER = struct.Struct("<4sHHIIf")
+
+def encode_surface(r, x_2D_plot, y_2D_plot, z_2D_plot, Bmag):
+    arrays = [np.ascontiguousarray(a, dtype="<f4") for a in (x_2D_plot, y_2D_plot, z_2D_plot, Bmag)]
+    n_theta, n_phi = arrays[0].shape
+    header = SURFACE_HEADER.pack(SURFACE_MAGIC, SURFACE_VERSION, len(arrays), n_theta, n_phi, r)
+    return header + b"".join(a.tobytes() for a in arrays)
+
+def render_surface_png(x_2D_plot, y_2D_plot, z_2D_plot, Bmag):
+    """Static matplotlib rendering of the boundary surface, as PNG bytes"""
+    with metrics.span("matplotlib"):
+        return _render_surface_png(x_2D_plot, y_2D_plot, z_2D_plot, Bmag)
+
+def _render_surface_png(x_2D_plot, y_2D_plot, z_2D_plot, Bmag):
+    # Create a regular matplotlib figure for 3D plotting
+    fig = plt.figure(figsize=(10, 8))
+    ax = fig.add_subplot(111, projection='3d')
+    
+    # Plot the surface with coloring based on magnetic field strength
+    start_time = time()
+    surf = ax.plot_surface(
+        x_2D_plot, y_2D_plot, z_2D_plot,
+        facecolors=plt.cm.viridis(plt.Normalize()(Bmag)),
+        rstride=1, cstride=1, antialiased=False, linewidth=0
+    )
+    print(f"Plotting the surface took {time() - start_time:.2f} seconds")
+    
+    # Add a colorbar for reference
+    m = plt.cm.ScalarMappable(cmap=plt.cm.viridis, norm=plt.Normalize(vmin=Bmag.min(), vmax=Bmag.max()))
+    m.set_array([])
+    cbar = plt.colorbar(m, ax=ax, shrink=0.7)
+    cbar.set_label('|B| [T]')
+    
+    # Set equal aspect ratio for the 3D plot
+    # This is important for the stellarator to look right
+    ax.set_box_aspect([1, 1, 1])
+    ax.set_axis_off()  # Hide the axes
+    
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches='tight', dpi=150)
+    plt.close(fig)  # Close the figure to free memory
+    png = buffer.getvalue()
+    buffer.close()
+    return png
+
+def render_axis_png(stel):
+    """Static plot of the magnetic axis, used when no boundary can be found"""
+    with metrics.span("matplotlib"):
+        return _render_axis_png(stel)
+
+def _render_axis_png(stel):
+    fig = plt.figure(figsize=(10, 8))
+    ax = fig.gca()
+    start_time = time()
+    stel.plot_axis(show=False)
+    print(f"Plotting axis took {time() - start_time:.2f} seconds")
+    
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches='tight', dpi=150)
+    plt.close(fig)
+    png = buffer.getvalue()
+    buffer.close()
+    return png
+
+# How generate_plot handles the static PNG:
+#   lazy   - skip the surface PNG (fetch it from /api/plot/<id>/image); the
+#            axis plot is still inlined when there is no 3D boundary
+#   none   - never rasterize
+#   only   - return just the PNG, no interactive data
+#   inline - interactive data and the surface PNG (previous behaviour)
+STATIC_MODES = ("lazy", "none", "only", "inline")
+default_static_mode = "lazy"
+
+# Modified function to generate plot data for interactive visualization
+def generate_plot(stel, config_id, static=default_static_mode):
+    try:
+        # Callers pass the database row as config_id; its first column is the id
+        row_id = config_id[0] if isinstance(config_id, (tuple, list)) else config_id
+        boundary = compute_boundary(stel, row_id)
         
-        if not success:
+        if boundary is None:
             # If all radius values fail, fall back to a simpler visualization
-            # Create a simple plot showing the axis
-            fig = plt.figure(figsize=(10, 8))
-            ax = fig.gca()
-            start_time = time()
-            stel.plot_axis(show=False)
-            print(f"Plotting axis took {time() - start_time:.2f} seconds")
-            
-            # Generate static image for the fallback visualization
-            buffer = io.BytesIO()
-            fig.savefig(buffer, format="png", bbox_inches='tight', dpi=150)
-            plt.close(fig)
-            buffer.seek(0)
-            img_data = base64.b64encode(buffer.getvalue()).decode("utf-8")
-            buffer.close()
+            # showing the axis
+            img_data = None
+            if static != "none":
+                img_data = base64.b64encode(render_axis_png(stel)).decode("utf-8")
             
             return {
                 "image": img_data, 
                 "interactive_data": None,
                 "error": "Could not generate 3D boundary visualization for this configuration."
             }
+        r, x_2D_plot, y_2D_plot, z_2D_plot, Bmag = boundary
         
-        # Create a regular matplotlib figure for 3D plotting
-        fig = plt.figure(figsize=(10, 8))
-        ax = fig.add_subplot(111, projection='3d')
-        
-        # Get the magnetic field strength on the surface for coloring
-        theta1D = np.linspace(0, 2 * np.pi, ntheta)
-        phi1D = np.linspace(0, 2 * np.pi, nphi_plot)
-        phi2D, theta2D = np.meshgrid(phi1D, theta1D)
-        Bmag = stel.B_mag(r, theta2D, phi2D)
-        
-        # Plot the surface with coloring based on magnetic field strength
-        start_time = time()
-        surf = ax.plot_surface(
-            x_2D_plot, y_2D_plot, z_2D_plot,
-            facecolors=plt.cm.viridis(plt.Normalize()(Bmag)),
-            rstride=1, cstride=1, antialiased=False, linewidth=0
-        )
-        print(f"Plotting the surface took {time() - start_time:.2f} seconds")
-        
-        # Add a colorbar for reference
-        m = plt.cm.ScalarMappable(cmap=plt.cm.viridis, norm=plt.Normalize(vmin=Bmag.min(), vmax=Bmag.max()))
-        m.set_array([])
-        cbar = plt.colorbar(m, ax=ax, shrink=0.7)
-        cbar.set_label('|B| [T]')
-        
-        # Set equal aspect ratio for the 3D plot
-        # This is important for the stellarator to look right
-        ax.set_box_aspect([1, 1, 1])
-        ax.set_axis_off()  # Hide the axes
-        
-        # Generate static image for fallback
-        buffer = io.BytesIO()
-        fig.savefig(buffer, format="png", bbox_inches='tight', dpi=150)
-        plt.close(fig)  # Close the figure to free memory
-        buffer.seek(0)
-        img_data = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        buffer.close()
+        # Generate static image for fallback only when asked for
+        img_data = None
+        if static in ("inline", "only"):
+            img_data = base64.b64encode(
+                render_surface_png(x_2D_plot, y_2D_plot, z_2D_plot, Bmag)
+            ).decode("utf-8")
+        if static == "only":
+            return {"image": img_data, "interactive_data": None}
         
         # Create Plotly data for interactive visualization
         try:
             # Create Plotly figure directly, not converting from matplotlib
             # which often has issues with 3D plots
-            start_time = time()
-            plotly_fig = {
-                "data": [{
-                    "type": "surface",
-                    "x": x_2D_plot.tolist(),
-                    "y": y_2D_plot.tolist(),
-                    "z": z_2D_plot.tolist(),
-                    "surfacecolor": Bmag.tolist(),
-                    "colorscale": "Viridis",
-                    "colorbar": {"title": "|B| [T]"},
-                    "showscale": True
-                }],
-                "layout": {
-                    "title": f"Stellarator Configuration {config_id}",
-                    "autosize": True,
-                    "scene": {
-                        "xaxis": {"visible": False},
-                        "yaxis": {"visible": False},
-                        "zaxis": {"visible": False},
-                        "aspectmode": "data"
-                    },
-                    "margin": {"l": 0, "r": 0, "b": 0, "t": 30},
-                    "paper_bgcolor": "rgb(240, 240, 240)"
-                }
-            }
-            plot_json = json.dumps(plotly_fig)
+            plotly_fig = plotly_surface_figure(x_2D_plot, y_2D_plot, z_2D_plot, Bmag, config_id)
+            with metrics.span("json"):
+                plot_json = json.dumps(plotly_fig)
             return {"image": img_data, "interactive_data": plot_json}
             
         except Exception as e:
@@ -525,23 +959,89 @@ def generate_plot(stel, config_id):
         return {"image": None, "interactive_data": None, "error": "Failed to generate visualization"}
     
 
-def generate_grid_plot(stel):
+GRID_FORMATS = ("plotly", "series")
+
+def grid_kind(grid_format):
+    """Result cache and precomputed store kind of an /api/grid format"""
+    return "grid" if grid_format == "plotly" else "grid-series"
+
+def grid_series(stel):
+    """
+    The diagnostics shown by /api/grid, as (phi, [(name, values, nonnegative)])
+    in display order. nonnegative asks for a y axis starting at zero.
+    """
     order = stel.order
+    plot_names = [
+        'R0', 'Z0',
+        #, 'R0p', 'Z0p', 'R0pp', 'Z0pp',
+        # 'R0ppp', 'Z0ppp',
+        'curvature', 'torsion', 'sigma', 
+        # 'X1c', 'Y1c', 'Y1s',
+        'elongation', 'L_grad_B'
+    ]
+    
+    # Add order-specific plots
+    if order != 'r1' and (not essos_found):
+        plot_names.extend([
+            'L_grad_grad_B', 'B20',
+            # 'V1', 'V2', 'V3',
+            # 'X20', 'X2c', 'X2s', 'Y20', 'Y2c', 'Y2s', 'Z20', 'Z2c', 'Z2s'
+        ])
+        
+    # if order == 'r3':
+    #     plot_names.extend(['X3c1', 'Y3c1', 'Y3s1'])
+    
+    # Special cases with custom data
+    special_cases = {
+        '1/L_grad_B': stel.inv_L_grad_B,
+        # '1/L_grad_grad_B': stel.grad_grad_B_inverse_scale_length_vs_varphi
+    }
+    
+    if order != 'r1' and (not essos_found):
+        special_cases['1/L_grad_grad_B']=stel.grad_grad_B_inverse_scale_length_vs_varphi
+    
+    series = []
+    for name in plot_names:
+        try:
+            series.append((name, getattr(stel, name), name in ['curvature', 'elongation', 'L_grad_B']))
+        except AttributeError:
+            print(f"Attribute {name} not found in Qsc object")
+    series += [(name, data, name == '1/L_grad_B') for name, data in special_cases.items()]
+    
+    # Add singularity radius plot for r2 and r3 orders
+    if order != 'r1' and (not essos_found):
+        data = np.array(stel.r_singularity_vs_varphi, dtype=float)
+        data[data > 1e20] = np.nan  # Handle large values
+        series.append(('r_singularity', data, True))
+    return stel.phi, series
+
+def grid_series_body(stel):
+    """
+    Lean /api/grid body (format=series): the shared phi array and the raw
+    diagnostic arrays as Plotly typed arrays, without any figure layout.
+    Returns (body, cacheable).
+    """
+    try:
+        phi, series = grid_series(stel)
+        with metrics.span("json"):
+            return json.dumps({
+                "phi": plotly_typed_array(phi),
+                "series": {name: plotly_typed_array(values) for name, values, _ in series},
+                "nonnegative": [name for name, _, nonnegative in series if nonnegative],
+            }).encode("utf-8"), True
+    except Exception as e:
+        print(f"Error generating diagnostic series: {e}")  # Log full error server-side
+        return json.dumps({"error": "Failed to generate visualization"}).encode("utf-8"), False
+
+def generate_grid_plot(stel):
     # Create individual Plotly figures (new approach)
     try:
         # List to store all individual plots
         individual_plots = []
-        phi = stel.phi
+        phi, series = grid_series(stel)
         
         # Helper function to create individual plots
-        def create_individual_plot(title, data=None, y0=False):
-            if data is None:
-                try:
-                    data = getattr(stel, title)
-                except AttributeError:
-                    print(f"Attribute {title} not found in Qsc object")
-                    return None
-            
+        def create_individual_plot(title, data, y0=False):
             # Create a standalone figure for this diagnostic
             fig = go.Figure()
             fig.add_trace(
@@ -571,62 +1071,20 @@ def generate_grid_plot(stel):
                 "figure": fig
             }
         
-        # Create individual plots for all diagnostics
-        plot_names = [
-            'R0', 'Z0',
-            #, 'R0p', 'Z0p', 'R0pp', 'Z0pp',
-            # 'R0ppp', 'Z0ppp',
-            'curvature', 'torsion', 'sigma', 
-            # 'X1c', 'Y1c', 'Y1s',
-            'elongation', 'L_grad_B'
-        ]
-        
-        # Add order-specific plots
-        if order != 'r1' and (not essos_found):
-            plot_names.extend([
-                'L_grad_grad_B', 'B20',
-                # 'V1', 'V2', 'V3',
-                # 'X20', 'X2c', 'X2s', 'Y20', 'Y2c', 'Y2s', 'Z20', 'Z2c', 'Z2s'
-            ])
-            
-        # if order == 'r3':
-        #     plot_names.extend(['X3c1', 'Y3c1', 'Y3s1'])
-        
-        # Special cases with custom data
-        special_cases = {
-            '1/L_grad_B': stel.inv_L_grad_B,
-            # '1/L_grad_grad_B': stel.grad_grad_B_inverse_scale_length_vs_varphi
-        }
-        
-        if order != 'r1' and (not essos_found):
-            special_cases['1/L_grad_grad_B']=stel.grad_grad_B_inverse_scale_length_vs_varphi
-        
-        # Create plots for standard attributes and special cases
-        all_plots = [(name, None, name in ['curvature', 'elongation', 'L_grad_B']) for name in plot_names] + \
-                [(name, data, name == '1/L_grad_B') for name, data in special_cases.items()]
-
-        for name, data, y0 in all_plots:
-            plot = create_individual_plot(name, data=data, y0=y0)
-            if plot: individual_plots.append(plot)
-        
-        # Add singularity radius plot for r2 and r3 orders
-        if order != 'r1' and (not essos_found):
-            data = stel.r_singularity_vs_varphi.copy()
-            data[data > 1e20] = np.nan  # Handle large values
-            plot = create_individual_plot('r_singularity', data=data, y0=True)
-            if plot:
-                individual_plots.append(plot)
+        for name, data, y0 in series:
+            individual_plots.append(create_individual_plot(name, data, y0=y0))
         
         # Convert all figures to JSON
         plots_json = {}
-        for plot in individual_plots:
-            try:
-                plots_json[plot["name"]] = json.dumps(
-                    plot["figure"], 
-                    cls=plotly.utils.PlotlyJSONEncoder
-                )
-            except Exception as e:
-                print(f"Error serializing {plot['name']}: {e}")
+        with metrics.span("json"):
+            for plot in individual_plots:
+                try:
+                    plots_json[plot["name"]] = json.dumps(
+                        plot["figure"], 
+                        cls=plotly.utils.PlotlyJSONEncoder
+                    )
+                except Exception as e:
+                    print(f"Error serializing {plot['name']}: {e}")
         
         return {
             "image": None,  # Keep the fallback static image
@@ -638,11 +1096,12 @@ def generate_grid_plot(stel):
         
         try:
             # Keep the static image for fallback (existing code)
-            fig = plt.figure(figsize=(14, 7))
-            stel.plot(newfigure=False, show=False)
-            buffer = io.BytesIO()
-            fig.savefig(buffer, format="png", bbox_inches='tight', dpi=150)
-            plt.close(fig)
+            with metrics.span("matplotlib"):
+                fig = plt.figure(figsize=(14, 7))
+                stel.plot(newfigure=False, show=False)
+                buffer = io.BytesIO()
+                fig.savefig(buffer, format="png", bbox_inches='tight', dpi=150)
+                plt.close(fig)
             buffer.seek(0)
             img_data = base64.b64encode(buffer.getvalue()).decode("utf-8")
             buffer.close()
@@ -680,49 +1139,632 @@ def get_stel_from_config(config):
 
     start_time = time()
     # Create a fresh Qsc instance for thread-safety
-    stel = Qsc(**config_params)
+    with metrics.span("qsc"):
+        stel = Qsc(**config_params)
     print(f"Creating Qsc object took {time() - start_time:.2f} seconds")
     return stel
 
-# Update the API endpoint
-@app.route("/api/plot/<int:config_id>", methods=["GET"])
-@cross_origin()
-def get_plot_api(config_id):
+def fetch_config(config_id):
     conn = connect_db()
     cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, rc1, rc2, rc3, zs1, zs2, zs3, nfp, etabar, B2c, p2, axis_length, iota FROM XGStels WHERE id = ?", (config_id,)
-    )
-    selected_config = cursor.fetchone()
-    conn.close()
+    with metrics.span("db_query"):
+        cursor.execute(
+            "SELECT id, rc1, rc2, rc3, zs1, zs2, zs3, nfp, etabar, B2c, p2, axis_length, iota FROM XGStels WHERE id = ?", (config_id,)
+        )
+        selected_config = cursor.fetchone()
+    return selected_config
+
+def plot_response_body(plot_result):
+    """Serialize a generate_plot/generate_grid_plot result as an API response body"""
+    with metrics.span("json"):
+        return json.dumps({
+            "plot_data": plot_result["image"],
+            "interactive_data": plot_result["interactive_data"]
+        }).encode("utf-8")
+
+def plot_result_ok(plot_result):
+    return plot_result["image"] is not None or plot_result["interactive_data"] is not None
+
+def single_flight_body(key, compute, wait=True):
+    """
+    Return the response body for `key` from the result cache, or compute it
+    with `compute()` -> (body, cacheable). Concurrent requests for the same
+    key, in this worker or another one, wait for a single computation.
+    Cacheable bodies are stored. Returns (body, cacheable), or with
+    wait=False None if someone else is already computing `key`.
+    """
+    body = result_cache.get(key)
+    if body is not None:
+        return body, True
+
+    def lookup():
+        # Finished by another worker while this one waited for the lock
+        body = result_cache.get(key)
+        return None if body is None else (body, True)
+
+    def render():
+        body, cacheable = compute()
+        if cacheable:
+            result_cache.put(key, body)
+        return body, cacheable
+
+    return (single_flight.do if wait else single_flight.try_do)(key, render, lookup)
+
+def render_body(kind, config):
+    """
+    Compute the response body of `kind` for a database row.
+    Returns (body, cacheable); body is None if there is nothing to return.
+
+    kinds: plot, plot-<static mode>, grid, grid-series, plot-png, surface-bin, surface-plotly
+    """
+    start_time = time()
+    result = render_stel_body(kind, get_stel_from_config(config), config)
+    print(f"Rendering {kind} for config {config[0]} took {time() - start_time:.2f} seconds")
+    return result
+
+def render_stel_body(kind, stel, config):
+    """render_body for an already constructed Qsc instance"""
+    if kind == "plot" or (kind.startswith("plot-") and kind[5:] in STATIC_MODES):
+        static = default_static_mode if kind == "plot" else kind[5:]
+        plot_result = generate_plot(stel, config, static=static)
+        body, cacheable = plot_response_body(plot_result), plot_result_ok(plot_result)
+    elif kind == "grid":
+        plot_result = generate_grid_plot(stel)
+        body, cacheable = plot_response_body(plot_result), plot_result_ok(plot_result)
+    elif kind == "grid-series":
+        body, cacheable = grid_series_body(stel)
+    elif kind == "plot-png":
+        boundary = compute_boundary(stel, config[0])
+        if boundary is None:
+            body = render_axis_png(stel)
+        else:
+            r, x_2D_plot, y_2D_plot, z_2D_plot, Bmag = boundary
+            body = render_surface_png(x_2D_plot, y_2D_plot, z_2D_plot, Bmag)
+        cacheable = True
+    elif kind in ("surface-bin", "surface-plotly"):
+        boundary = compute_boundary(stel, config[0])
+        if boundary is None:
+            return None, False
+        if kind == "surface-bin":
+            body = encode_surface(*boundary)
+        else:
+            r, x_2D_plot, y_2D_plot, z_2D_plot, Bmag = boundary
+            body = json.dumps(plotly_surface_figure(
+                x_2D_plot, y_2D_plot, z_2D_plot, Bmag, config[0], typed=True
+            )).encode("utf-8")
+        cacheable = True
+    else:
+        raise ValueError(f"Unknown kind {kind}")
+    return body, cacheable
+
+def bundle_bodies(kinds, config, wait=True):
+    """
+    Yield (kind, body, cacheable) for several kinds of one database row,
+    rendered from a single Qsc instance through the same single-flight keys
+    as cached_body, so concurrent bundles and /api/plot or /api/grid
+    requests render each body once. With wait=False, kinds that someone
+    else is rendering are skipped instead of waited for.
+    """
+    stel = []
+
+    def compute(kind):
+        if not stel:
+            stel.append(get_stel_from_config(config))
+        return render_stel_body(kind, stel[0], config)
+
+    for kind in kinds:
+        result = single_flight_body(make_cache_key(kind, config, render_params()), lambda: compute(kind), wait)
+        if result is not None:
+            yield (kind,) + tuple(result)
+
+def render_bundle(kinds, config):
+    """
+    Compute process side of a bundle: each cacheable body goes into the
+    result cache as soon as it is ready, so the streaming request can pick
+    it up while the rest still renders. Kinds another request is rendering
+    are left to it rather than waited for: that request may itself be
+    waiting for a compute process. Returns {kind: cacheable} for the kinds
+    rendered (or found cached) here.
+    """
+    start_time = time()
+    rendered = {kind: cacheable for kind, _, cacheable in bundle_bodies(kinds, config, wait=False)}
+    print(f"Rendering {', '.join(kinds)} for config {config[0]} took {time() - start_time:.2f} seconds")
+    return rendered
+
+def cached_body(kind, config):
+    """
+    Return (body, cacheable) for `kind` from the result cache, or render it
+    in the compute pool (or inline if the pool is disabled). May raise
+    PoolSaturated or JobTimeout.
+    """
+    if compute_pool is None:
+        compute = lambda: render_body(kind, config)
+    else:
+        compute = lambda: compute_pool.run(kind, config)
+    return single_flight_body(make_cache_key(kind, config, render_params()), compute)
+
+def write_back_precomputed(kind, config_id, body):
+    try:
+        precomputed_store.store(kind, config_id, body)
+    except OSError as e:
+        print(f"Could not write back precomputed {kind} for {config_id}: {e}")
+
+def plot_response(kind, config_id):
+    """
+    Serve a plot response, preferring the precomputed artifact on disk.
+    A fresh result is rendered on a miss and written back to the
+    precomputed store. The result cache key doubles as the ETag, so a
+    client holding the current version gets a 304 without any rendering.
+    """
+    selected_config = fetch_config(config_id)
     if not selected_config:
         return jsonify({"error": "Configuration not found"}), 404
+    key = make_cache_key(kind, selected_config, render_params())
+    not_modified = early_not_modified(key)
+    if not_modified is not None:
+        return not_modified
+
+    precomputed_path = precomputed_store.lookup(kind, config_id)
+    if precomputed_path:
+        # send_file hands the open file to the WSGI server (sendfile where supported)
+        response = send_stored_file(precomputed_path)
+    else:
+        body, cacheable = cached_body(kind, selected_config)
+        if not cacheable:
+            return app.response_class(body, mimetype="application/json")
+        write_back_precomputed(kind, config_id, body)
+        response = encoded_response(body, lambda encoding: result_cache_variant(key, body, encoding))
+    set_validators(response, key)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+@app.errorhandler(PoolSaturated)
+def compute_pool_saturated(e):
+    response = jsonify({"error": "Server busy, please retry shortly"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+@app.errorhandler(JobTimeout)
+def compute_job_timeout(e):
+    print(f"Compute job timed out: {e}")
+    return jsonify({"error": "Rendering this configuration took too long"}), 504
+
+# Update the API endpoint
+@app.route("/api/plot/<int:config_id>", methods=["GET"])
+@cross_origin()
+def get_plot_api(config_id):
+    static = request.args.get("static", default_static_mode).lower()
+    if static not in STATIC_MODES:
+        return jsonify({"error": "Unsupported static mode"}), 400
+    # The default mode keeps the plain "plot" kind used by the precompute job
+    kind = "plot" if static == default_static_mode else f"plot-{static}"
 
     start_time = time()
-    plot_result = generate_plot(get_stel_from_config(selected_config), selected_config)
+    response = plot_response(kind, config_id)
     print(f"Generating plot took {time() - start_time:.2f} seconds")
-    return jsonify({
-        "plot_data": plot_result["image"],
-        "interactive_data": plot_result["interactive_data"]
-    })
-@app.route("/api/grid/<int:config_id>", methods=["GET"])
+    return response
+
+@app.route("/api/plot/<int:config_id>/image", methods=["GET"])
 @cross_origin()
-def get_plot_grid_api(config_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, rc1, rc2, rc3, zs1, zs2, zs3, nfp, etabar, B2c, p2, axis_length, iota FROM XGStels WHERE id = ?", (config_id,)
-    )
-    selected_config = cursor.fetchone()
-    conn.close()
+def get_plot_image_api(config_id):
+    """Static PNG of the boundary (or of the axis), rendered on first use and cached"""
+    selected_config = fetch_config(config_id)
     if not selected_config:
         return jsonify({"error": "Configuration not found"}), 404
+    key = make_cache_key("plot-png", selected_config, render_params())
+    not_modified = early_not_modified(key)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        body, _ = cached_body("plot-png", selected_config)
+    except (PoolSaturated, JobTimeout):
+        raise
+    except Exception as e:
+        print(f"Error generating plot image: {e}")  # Log full error server-side
+        return jsonify({"error": "Failed to generate visualization"}), 500
+    response = app.response_class(body, mimetype="image/png")
+    set_validators(response, key)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+@app.route("/api/grid/<int:config_id>", methods=["GET"])
+@cross_origin()
+def get_plot_grid_api(config_id):
+    grid_format = request.args.get("format", "plotly").lower()
+    if grid_format not in GRID_FORMATS:
+        return jsonify({"error": "Unsupported format"}), 400
+
     start_time = time()
-    plot_result = generate_grid_plot(get_stel_from_config(selected_config))
+    response = plot_response(grid_kind(grid_format), config_id)
     print(f"Generating grid plot took {time() - start_time:.2f} seconds")
+    return response
+
+BUNDLE_SECTIONS = ["config", "plot", "grid"]
+BUNDLE_CONFIG_COLUMNS = ["id", "rc1", "rc2", "rc3", "zs1", "zs2", "zs3", "nfp", "etabar", "B2c", "p2", "axis_length", "iota"]
+
+def bundle_line(section, body=None, error=None):
+    """One NDJSON line of a bundle; `body` is an already serialized JSON document"""
+    if error is not None:
+        return json.dumps({"section": section, "error": error}).encode("utf-8") + b"\n"
+    return b'{"section": "' + section.encode("utf-8") + b'", "data": ' + body + b"}\n"
+
+@app.route("/api/config/<int:config_id>/bundle", methods=["GET"])
+@cross_origin()
+def get_config_bundle_api(config_id):
+    """
+    The configuration row, plot and grid of one configuration in a single
+    response, as newline-delimited JSON ({"section": ..., "data": ...} per
+    line). Sections are sent as soon as they are ready: stored ones first,
+    then the ones rendered from a single Qsc instance.
+    """
+    sections = request.args.get("sections", ",".join(BUNDLE_SECTIONS)).lower().split(",")
+    sections = [section.strip() for section in sections if section.strip()]
+    if not sections or any(section not in BUNDLE_SECTIONS for section in sections):
+        return jsonify({"error": f"sections must be a subset of {', '.join(BUNDLE_SECTIONS)}"}), 400
+    static = request.args.get("static", default_static_mode).lower()
+    if static not in STATIC_MODES:
+        return jsonify({"error": "Unsupported static mode"}), 400
+    grid_format = request.args.get("format", "plotly").lower()
+    if grid_format not in GRID_FORMATS:
+        return jsonify({"error": "Unsupported format"}), 400
+
+    selected_config = fetch_config(config_id)
+    if not selected_config:
+        return jsonify({"error": "Configuration not found"}), 404
+
+    kinds = {}
+    if "plot" in sections:
+        kinds["plot"] = "plot" if static == default_static_mode else f"plot-{static}"
+    if "grid" in sections:
+        kinds["grid"] = grid_kind(grid_format)
+    keys = {section: make_cache_key(kind, selected_config, render_params()) for section, kind in kinds.items()}
+
+    ready = {}
+    for section, kind in kinds.items():
+        precomputed_path = precomputed_store.lookup(kind, config_id)
+        if precomputed_path:
+            with open(precomputed_path, "rb") as f:
+                ready[section] = f.read()
+        else:
+            body = result_cache.get(keys[section])
+            if body is not None:
+                ready[section] = body
+    missing = [section for section in kinds if section not in ready]
+    # Submitted before streaming starts, so a saturated pool is still a 503
+    future = None
+    if missing and compute_pool is not None:
+        future = compute_pool.submit("render_bundle", [kinds[section] for section in missing], selected_config)
+
+    def finished(section, body, cacheable):
+        if body is None or not cacheable:
+            return bundle_line(section, error="Failed to generate visualization")
+        write_back_precomputed(kinds[section], config_id, body)
+        return bundle_line(section, body)
+
+    def generate():
+        start_time = time()
+        for section in sections:
+            if section == "config":
+                yield bundle_line("config", json.dumps(dict(zip(BUNDLE_CONFIG_COLUMNS, selected_config))).encode("utf-8"))
+            elif section in ready:
+                yield bundle_line(section, ready[section])
+        pending = list(missing)
+        error = "Failed to generate visualization"
+        if future is None:
+            try:
+                bodies = bundle_bodies([kinds[section] for section in pending], selected_config)
+                for section, (_, body, cacheable) in zip(list(pending), bodies):
+                    pending.remove(section)
+                    yield finished(section, body, cacheable)
+            except Exception as e:
+                print(f"Error generating bundle for {config_id}: {e}")  # Log full error server-side
+        else:
+            # The compute process stores each section in the result cache as
+            # it finishes; stream them from there while the rest renders
+            while pending and not future.done():
+                for section in list(pending):
+                    body = result_cache.get(keys[section])
+                    if body is not None:
+                        pending.remove(section)
+                        yield finished(section, body, True)
+                sleep(0.1)
+            try:
+                rendered = compute_pool.wait(future, f"bundle for config {config_id}")
+                # Sections finished since the last poll come from the cache;
+                # ones the job left to a concurrent request are waited for
+                # through the usual single-flight path
+                for section in [section for section in pending if rendered.get(kinds[section], True)]:
+                    body, cacheable = cached_body(kinds[section], selected_config)
+                    pending.remove(section)
+                    yield finished(section, body, cacheable)
+            except JobTimeout:
+                error = "Rendering this configuration took too long"
+            except Exception as e:
+                print(f"Error generating bundle for {config_id}: {e}")  # Log full error server-side
+        for section in pending:
+            yield bundle_line(section, error=error)
+        print(f"Generating bundle for {config_id} took {time() - start_time:.2f} seconds")
+
+    response = app.response_class(generate(), mimetype="application/x-ndjson")
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+# Time budget used to decide that a queued or running job was lost (its
+# worker restarted) and to bound job waits and event streams
+job_deadline = (compute_pool.timeout + compute_pool.GRACE_SECONDS if compute_pool else 120) + 60
+
+def job_json(job):
+    job_id = job["job_id"]
+    return {
+        "job_id": job_id,
+        "kind": job["kind"],
+        "config_id": job["config_id"],
+        "status": job["status"],
+        "error": job["error"],
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events",
+        "result_url": f"/api/jobs/{job_id}/result",
+    }
+
+def job_result_body(job):
+    """The finished response body of a job, or None if it is not available"""
+    precomputed_path = precomputed_store.lookup(job["kind"], job["config_id"])
+    if precomputed_path:
+        with open(precomputed_path, "rb") as f:
+            return f.read()
+    return result_cache.get(job["job_id"])
+
+def run_render_job(job_id, kind, config):
+    """Background thread: render through the same cache path as the sync endpoints"""
+    async_jobs.update(job_id, "running")
+    deadline = time() + job_deadline
+    while True:
+        try:
+            body, cacheable = cached_body(kind, config)
+            break
+        except PoolSaturated as e:
+            if time() + e.retry_after > deadline:
+                async_jobs.update(job_id, "failed", "Server busy, please retry later")
+                return
+            # Stay queued until the compute pool has room
+            async_jobs.update(job_id, "queued")
+            sleep(e.retry_after)
+            async_jobs.update(job_id, "running")
+        except JobTimeout:
+            async_jobs.update(job_id, "failed", "Rendering this configuration took too long")
+            return
+        except Exception as e:
+            print(f"Error in render job {job_id}: {e}")  # Log full error server-side
+            async_jobs.update(job_id, "failed", "Failed to generate visualization")
+            return
+    if not cacheable:
+        async_jobs.update(job_id, "failed", "Failed to generate visualization")
+        return
+    write_back_precomputed(kind, config[0], body)
+    async_jobs.update(job_id, "done")
+
+def submit_render_job(kind, config_id):
+    selected_config = fetch_config(config_id)
+    if not selected_config:
+        return jsonify({"error": "Configuration not found"}), 404
+    job_id = make_cache_key(kind, selected_config, render_params())
+    done = precomputed_store.lookup(kind, config_id) is not None or result_cache.get(job_id) is not None
+    if async_jobs.claim(job_id, kind, config_id, "done" if done else "queued", job_deadline):
+        threading.Thread(target=run_render_job, args=(job_id, kind, selected_config), daemon=True).start()
+    response = jsonify(job_json(async_jobs.get(job_id)))
+    response.status_code = 202
+    response.headers["Location"] = f"/api/jobs/{job_id}"
+    return response
+
+@app.route("/api/plot/<int:config_id>/jobs", methods=["POST"])
+@cross_origin()
+def create_plot_job(config_id):
+    """
+    Start rendering /api/plot/<id> in the background and return a job to
+    poll (/api/jobs/<job_id>) or follow (/api/jobs/<job_id>/events).
+    """
+    static = request.args.get("static", default_static_mode).lower()
+    if static not in STATIC_MODES:
+        return jsonify({"error": "Unsupported static mode"}), 400
+    kind = "plot" if static == default_static_mode else f"plot-{static}"
+    return submit_render_job(kind, config_id)
+
+@app.route("/api/grid/<int:config_id>/jobs", methods=["POST"])
+@cross_origin()
+def create_grid_job(config_id):
+    """Start rendering /api/grid/<id> in the background (same `format` parameter)"""
+    grid_format = request.args.get("format", "plotly").lower()
+    if grid_format not in GRID_FORMATS:
+        return jsonify({"error": "Unsupported format"}), 400
+    return submit_render_job(grid_kind(grid_format), config_id)
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+@cross_origin()
+def get_job(job_id):
+    job = async_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_json(job))
+
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+@cross_origin()
+def get_job_result(job_id):
+    """Same body as the synchronous endpoint, once the job is done"""
+    job = async_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] != "done":
+        return jsonify(job_json(job)), 409
+    body = job_result_body(job)
+    if body is None:
+        return jsonify({"error": "Result expired, submit the job again"}), 410
+    return app.response_class(body, mimetype="application/json")
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+@cross_origin()
+def get_job_events(job_id):
+    """
+    Server-Sent Events: a `status` event whenever the job status changes,
+    then a `result` event carrying the response body when it is done.
+    """
+    if async_jobs.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        status = None
+        last_sent = time()
+        deadline = time() + job_deadline
+        while time() < deadline:
+            job = async_jobs.get(job_id)
+            if job is None:
+                return
+            if job["status"] != status:
+                status = job["status"]
+                yield f"event: status\ndata: {json.dumps(job_json(job))}\n\n"
+                last_sent = time()
+                if status == "done":
+                    body = job_result_body(job)
+                    if body is not None:
+                        yield f"event: result\ndata: {body.decode('utf-8')}\n\n"
+                    return
+                if status == "failed":
+                    return
+            elif time() - last_sent > 15:
+                # Keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                last_sent = time()
+            sleep(0.5)
+
+    response = app.response_class(events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route("/api/surface/<int:config_id>", methods=["GET"])
+@cross_origin()
+def get_surface_api(config_id):
+    """
+    Compact 3D boundary data. format=bin (default) returns the float32
+    layout described at SURFACE_HEADER; format=plotly returns the Plotly
+    figure with base64 typed arrays instead of nested lists.
+    """
+    file_format = request.args.get("format", "bin").lower()
+    if file_format not in ("bin", "plotly"):
+        return jsonify({"error": "Unsupported format"}), 400
+
+    selected_config = fetch_config(config_id)
+    if not selected_config:
+        return jsonify({"error": "Configuration not found"}), 404
+    key = make_cache_key(f"surface-{file_format}", selected_config, render_params())
+    not_modified = early_not_modified(key)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        body, _ = cached_body(f"surface-{file_format}", selected_config)
+    except (PoolSaturated, JobTimeout):
+        raise
+    except Exception as e:
+        print(f"Error computing boundary: {e}")  # Log full error server-side
+        return jsonify({"error": "Failed to generate surface"}), 500
+    if body is None:
+        return jsonify({"error": "Could not generate 3D boundary for this configuration."}), 404
+
+    if file_format == "bin":
+        # float32 data barely compresses
+        response = app.response_class(body, mimetype="application/octet-stream")
+    else:
+        response = encoded_response(body, lambda encoding: result_cache_variant(key, body, encoding))
+    set_validators(response, key)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+# Upper bound on the ids accepted by one /api/diagnostics/batch request
+BULK_DIAGNOSTICS_MAX_IDS = 2000
+
+def fetch_configs_by_id(config_ids):
+    conn = connect_db()
+    rows = []
+    # Stay under SQLite's host parameter limit
+    for start in range(0, len(config_ids), 500):
+        chunk = config_ids[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        with metrics.span("db_query"):
+            rows.extend(conn.execute(
+                f"SELECT id, rc1, rc2, rc3, zs1, zs2, zs3, nfp, etabar, B2c, p2, axis_length, iota "
+                f"FROM XGStels WHERE id IN ({placeholders})", chunk
+            ).fetchall())
+    return rows
+
+def axis_diagnostics(configs):
+    """
+    First-order diagnostics for many configurations, {config_id: {...}}.
+    Precomputed results are read from disk; the rest are evaluated in one
+    vectorized batch per nfp and written back.
+    """
+    results = {}
+    missing = []
+    for config in configs:
+        path = precomputed_store.lookup("axis", config[0])
+        if path:
+            with open(path, "rb") as f:
+                results[config[0]] = json.loads(f.read())
+        else:
+            missing.append(config)
+    if missing:
+        start_time = time()
+        computed = near_axis_batch.evaluate_rows(missing, nphi)
+        print(f"Batch evaluation of {len(missing)} configurations took {time() - start_time:.2f} seconds")
+        for config_id, values in computed.items():
+            results[config_id] = values
+            try:
+                precomputed_store.store("axis", config_id, json.dumps(values).encode("utf-8"))
+            except OSError as e:
+                print(f"Could not write back precomputed axis for {config_id}: {e}")
+    return results
+
+@app.route("/api/diagnostics/batch", methods=["POST"])
+@cross_origin()
+def get_bulk_diagnostics():
+    """
+    First-order near-axis diagnostics (iota, axis length, elongation,
+    L_grad_B, ...) for a list of configuration ids, computed in bulk.
+    Body: {"ids": [1, 2, ...]}
+    """
+    payload = request.get_json(silent=True) or {}
+    config_ids = payload.get("ids")
+    if not isinstance(config_ids, list) or not all(isinstance(i, int) for i in config_ids):
+        return jsonify({"error": "Expected a JSON body with a list of integer ids"}), 400
+    if len(config_ids) > BULK_DIAGNOSTICS_MAX_IDS:
+        return jsonify({"error": f"At most {BULK_DIAGNOSTICS_MAX_IDS} ids per request"}), 400
+
+    config_ids = list(dict.fromkeys(config_ids))
+    configs = fetch_configs_by_id(config_ids)
+    results = axis_diagnostics(configs)
+    return jsonify({
+        "fields": near_axis_batch.BATCH_FIELDS,
+        "results": {str(config_id): results[config_id] for config_id in config_ids if config_id in results},
+        "missing": [config_id for config_id in config_ids if config_id not in results],
+    })
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Request and span histograms of all workers, in the Prometheus text format"""
+    return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/api/stats", methods=["GET"])
+@cross_origin()
+def get_stats():
+    """Connection pool, result cache and warm-up statistics for this worker process"""
     return jsonify({
-        "plot_data": plot_result["image"],
-        "interactive_data": plot_result["interactive_data"]
+        "db_pool": db_pool.stats(),
+        "result_cache": result_cache.stats(),
+        "radius_table": radius_table.stats(),
+        "single_flight": single_flight.stats(),
+        "compute_pool": compute_pool.stats() if compute_pool else None,
+        "warmup_seconds": warmup_timings,
     })
 
 @app.route("/api/download/<int:config_id>", methods=["GET"])
@@ -743,7 +1785,6 @@ def download_config(config_id):
         (config_id,)
     )
     row = cursor.fetchone()
-    conn.close()
 
     # If config not found, return error
     if not row:
@@ -805,6 +1846,108 @@ def download_config(config_id):
             download_name=f'stellarator_config_{config_id}.json'
         )
 
+def export_rows(predicates, sort_field, sort_order):
+    """Matching rows in CONFIG_COLUMNS order, as lists of at most CHUNK_ROWS"""
+    chunk = config_export.CHUNK_ROWS
+    if column_store is not None and column_store.supports(predicates):
+        positions = column_store.select(column_store.mask(predicates), sort_field, sort_order)
+        for start in range(0, len(positions), chunk):
+            yield column_store.rows(positions[start:start + chunk])
+        return
+    # Keyset pages, so no cursor stays open between chunks
+    keyset = []
+    while True:
+        rows = query_configs(predicates + keyset, sort_field, sort_order, 0, chunk)
+        if rows:
+            yield rows
+        if len(rows) < chunk:
+            return
+        last = rows[-1]
+        keyset = [keyset_predicate(sort_field, sort_order, last[CONFIG_COLUMNS.index(sort_field)], last[0])]
+
+@app.route("/api/configs/export", methods=["GET"])
+@cross_origin()
+def export_configs():
+    """Every configuration matching the /api/configs filters, streamed as one file"""
+    file_format = request.args.get("format", default="csv", type=str).lower()
+    if file_format not in config_export.available_formats():
+        return jsonify({"error": "Unsupported format", "formats": config_export.available_formats()}), 400
+    sort_field = request.args.get("sort_field", default="id", type=str)
+    sort_order = request.args.get("sort_order", default="asc", type=str).lower()
+    if sort_field not in SORT_FIELDS or sort_order not in ("asc", "desc"):
+        return jsonify({"error": "Unsupported sort"}), 400
+
+    # Same database and query, same file
+    etag = hashlib.sha256(f"{db_version}?{request.query_string.decode('utf-8', 'replace')}".encode("utf-8")).hexdigest()
+    not_modified = early_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    predicates = parse_config_filters(request.args, max_config_id())
+    mimetype, extension, _ = config_export.EXPORT_FORMATS[file_format]
+    chunks = config_export.export_chunks(export_rows(predicates, sort_field, sort_order), file_format)
+    response = app.response_class(chunks, mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename=stellarator_configs.{extension}"
+    response.headers["X-Accel-Buffering"] = "no"
+    set_validators(response, etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+# Shapes compiled before the worker serves its first request
+WARMUP_NFPS = [1, 2, 3, 4, 5]
+warmup_timings = {"nfp": {}, "total": None}
+
+def warm_up(render=True, batch=True):
+    """
+    Run one configuration per nfp (at the module nphi) through the JAX code
+    paths this process uses: Qsc construction and the boundary (`render`)
+    and the bulk diagnostics engine (`batch`), so XLA compilation happens at
+    startup instead of on the first request. With the persistent compilation
+    cache, later processes load the compiled code from disk.
+    """
+    start_time = time()
+    conn = connect_db()
+    for nfp_val in WARMUP_NFPS:
+        config = conn.execute(
+            "SELECT id, rc1, rc2, rc3, zs1, zs2, zs3, nfp, etabar, B2c, p2, axis_length, iota "
+            "FROM XGStels WHERE nfp = ? ORDER BY id LIMIT 1", (nfp_val,)
+        ).fetchone()
+        if config is None:
+            continue
+        nfp_start = time()
+        try:
+            if render:
+                stel = get_stel_from_config(config)
+                if essos_found:
+                    compute_boundary(stel)
+            if batch:
+                # Both padded batch sizes of the bulk diagnostics engine
+                small = near_axis_batch.BATCH_SIZES[0]
+                near_axis_batch.evaluate_rows([config] * small, nphi)
+                near_axis_batch.evaluate_rows([config] * (small + 1), nphi)
+        except Exception as e:
+            print(f"Warm-up for nfp={nfp_val} failed: {e}")
+        warmup_timings["nfp"][str(nfp_val)] = round(time() - nfp_start, 3)
+        print(f"Warm-up for nfp={nfp_val} took {time() - nfp_start:.2f} seconds")
+    warmup_timings["total"] = round(time() - start_time, 3)
+    print(f"Warm-up took {warmup_timings['total']:.2f} seconds")
+
+def start_worker():
+    """
+    Startup work of a web worker, called by the gunicorn post_worker_init
+    hook (gunicorn.conf.py), stellarator.wsgi and the development server.
+    Importing this module does not run it, so precompute and compute
+    processes only pay for what they use.
+    """
+    if os.environ.get("STELLARATOR_WARMUP", "1") == "0":
+        return
+    if compute_pool is not None:
+        # Renders run in the compute processes, which warm up as they start
+        compute_pool.start()
+    warm_up(render=compute_pool is None)
+
 
 if __name__ == "__main__":
+    start_worker()
     app.run(host="0.0.0.0", port=5000)
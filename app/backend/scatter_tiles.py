@@ -0,0 +1,90 @@
+import numpy as np
+
+# Columns that can be put on either axis of a scatter tile (the plottable
+# columns of /api/scatter)
+TILE_FIELDS = ["iota", "beta", "r_singularity", "etabar", "B2c", "rc1", "rc2", "zs1", "zs2"]
+
+# iota is displayed as |iota|
+ABSOLUTE_FIELDS = {"iota"}
+
+MAX_ZOOM = 16
+DEFAULT_BINS = 128
+DEFAULT_MAX_POINTS = 1000
+
+
+def axis_values(values, field):
+    values = np.asarray(values, dtype=np.float64)
+    return np.abs(values) if field in ABSOLUTE_FIELDS else values
+
+
+def domain(values):
+    """[min, max] of the finite values, widened if degenerate; None if there are none"""
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return None
+    low, high = float(finite.min()), float(finite.max())
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return [low, high]
+
+
+def tile_bounds(axis_domain, zoom, index):
+    """
+    Interval covered by tile `index` at `zoom`: the domain is split into
+    2**zoom equal tiles per axis, like a map tile pyramid.
+    """
+    low, high = axis_domain
+    width = (high - low) / 2**zoom
+    return [low + index * width, low + (index + 1) * width]
+
+
+def tile_mask(values, bounds, last):
+    # Tiles are half-open except the last one, which includes the domain maximum
+    low, high = bounds
+    return (values >= low) & ((values <= high) if last else (values < high))
+
+
+def aggregate_tile(ids, nfps, x, y, x_bounds, y_bounds, bins=DEFAULT_BINS, max_points=DEFAULT_MAX_POINTS):
+    """
+    Summarize the points inside one tile (already masked to it).
+
+    Sparse tiles return the points themselves. Dense tiles are binned on a
+    bins x bins grid and return, per non-empty cell, the count and one
+    representative point (the first in input order), so the payload size is
+    bounded by bins**2 whatever the zoom.
+    """
+    total = len(ids)
+    if total <= max_points:
+        return {
+            "mode": "points",
+            "total": total,
+            "points": {
+                "id": ids.tolist(),
+                "nfp": nfps.tolist(),
+                "x": x.tolist(),
+                "y": y.tolist(),
+            },
+        }
+
+    x_width = (x_bounds[1] - x_bounds[0]) / bins
+    y_width = (y_bounds[1] - y_bounds[0]) / bins
+    ix = np.clip(((x - x_bounds[0]) / x_width).astype(np.int64), 0, bins - 1)
+    iy = np.clip(((y - y_bounds[0]) / y_width).astype(np.int64), 0, bins - 1)
+    cells = iy * bins + ix
+
+    counts = np.bincount(cells, minlength=bins * bins)
+    occupied, first = np.unique(cells, return_index=True)
+    return {
+        "mode": "bins",
+        "total": total,
+        "bins": bins,
+        "cells": {
+            "ix": (occupied % bins).tolist(),
+            "iy": (occupied // bins).tolist(),
+            "count": counts[occupied].tolist(),
+            "id": ids[first].tolist(),
+            "nfp": nfps[first].tolist(),
+            "x": x[first].tolist(),
+            "y": y[first].tolist(),
+        },
+    }
@@ -0,0 +1,159 @@
+import os
+import threading
+from time import sleep, time
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking on this platform; threads are still coalesced
+    fcntl = None
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent computations of the same key.
+
+    Within a process, the first thread to ask for a key runs the computation
+    and the others wait for it and share its result (or exception). Across
+    gunicorn workers, the leader also holds an flock on a lock file in
+    `lock_dir`; other processes wait for the lock and then call `lookup()`,
+    which finds the result the leader wrote to the shared cache.
+
+    Lock files are striped by key prefix (at most 4096 files), so two
+    unrelated keys occasionally share a lock. A waiter gives up after
+    `wait_timeout` seconds and computes on its own rather than hang behind
+    a stuck leader.
+    """
+
+    def __init__(self, lock_dir, wait_timeout=300):
+        self.lock_dir = lock_dir
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._coalesced = 0
+        self._led = 0
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, compute, lookup=lambda: None):
+        """
+        Return compute() for `key`, running it at most once at a time per key.
+        lookup() is called under the lock and may return a result someone
+        else finished in the meantime (None if there is none).
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._led += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            if flight.done.wait(self.wait_timeout):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+            print(f"Single-flight: gave up waiting for {key}, computing it again")
+            return compute()
+
+        try:
+            with self._file_lock(key):
+                return self._lead(key, flight, compute, lookup)
+        finally:
+            self._land(key, flight)
+
+    def try_do(self, key, compute, lookup=lambda: None):
+        """
+        do() without waiting: returns None at once if another thread or
+        process is computing `key` (or holds the lock file it shares)
+        """
+        with self._lock:
+            if key in self._flights:
+                return None
+        with self._file_lock(key, blocking=False) as lock:
+            if not lock.held:
+                return None
+            with self._lock:
+                if key in self._flights:
+                    # Another thread got here first and waits for this lock
+                    return None
+                flight = self._flights[key] = _Flight()
+                self._led += 1
+            try:
+                return self._lead(key, flight, compute, lookup)
+            finally:
+                self._land(key, flight)
+
+    def _lead(self, key, flight, compute, lookup):
+        try:
+            result = lookup()
+            if result is None:
+                result = compute()
+            flight.result = result
+            return result
+        except Exception as e:
+            flight.error = e
+            raise
+
+    def _land(self, key, flight):
+        with self._lock:
+            del self._flights[key]
+        flight.done.set()
+
+    def _file_lock(self, key, blocking=True):
+        return _FileLock(os.path.join(self.lock_dir, f"{key[:3]}.lock"), self.wait_timeout, blocking)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._flights), "led": self._led, "coalesced": self._coalesced}
+
+
+class _FileLock:
+    """
+    flock on `path`. A blocking lock gives up after `timeout` seconds and
+    continues without it; a non-blocking one returns at once with `held`
+    False if the lock is taken.
+    """
+
+    def __init__(self, path, timeout, blocking=True):
+        self.path = path
+        self.timeout = timeout
+        self.blocking = blocking
+        self.file = None
+        self.held = True
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        self.file = open(self.path, "a")
+        deadline = time() + self.timeout
+        while True:
+            try:
+                fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except BlockingIOError:
+                if not self.blocking:
+                    self.file.close()
+                    self.file = None
+                    self.held = False
+                    return self
+                if time() > deadline:
+                    print(f"Single-flight: lock {self.path} still held, continuing without it")
+                    self.file.close()
+                    self.file = None
+                    return self
+                sleep(0.05)
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
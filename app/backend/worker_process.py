@@ -0,0 +1,26 @@
+import multiprocessing
+import signal
+
+
+class TaskTimeout(BaseException):
+    """
+    Raised inside a worker process when a task exceeds its time budget.
+    Derives from BaseException so the broad `except Exception` blocks in
+    generate_plot/generate_grid_plot cannot swallow it.
+    """
+
+
+def _raise_timeout(signum, frame):
+    raise TaskTimeout()
+
+
+def init_worker():
+    """Process pool initializer: signal.setitimer budgets raise TaskTimeout"""
+    # Ctrl+C and shutdown are handled by the parent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGALRM, _raise_timeout)
+
+
+def spawn_context():
+    # spawn keeps JAX's threads from being forked into the workers
+    return multiprocessing.get_context("spawn")
@@ -1,52 +1,144 @@
+import json
+import sys
+import numpy as np
 import pandas as pd
 import sqlite3
 
+try:
+    from .config_query import INDEXED_FIELDS, SEARCH_FIELDS
+except ImportError:
+    from config_query import INDEXED_FIELDS, SEARCH_FIELDS
+
 # File paths
 csv_file = "XGStels.csv"
 db_file = "XGStels.db"
 table_name = "XGStels"
+stats_table_name = "XGStels_stats"
+
+# Column statistics served by /api/ranges
+QUANTILES = [0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1.0]
+HISTOGRAM_BINS = 32
+
+# Seed for the per-nfp random permutation used by /api/scatter
+SAMPLE_SEED = 0
+
+
+def create_table(conn, df):
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+
+    # Recreate the table with AUTOINCREMENT on id
+    cursor.execute(f"""
+    CREATE TABLE {table_name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        rc1 REAL,
+        rc2 REAL,
+        rc3 REAL,
+        zs1 REAL,
+        zs2 REAL,
+        zs3 REAL,
+        nfp INTEGER,
+        etabar REAL,
+        B2c REAL,
+        p2 REAL,
+        axis_length REAL,
+        iota REAL,
+        max_elongation REAL,
+        min_L_grad_B REAL,
+        min_R0 REAL,
+        r_singularity REAL,
+        L_grad_grad_B REAL,
+        B20_variation REAL,
+        beta REAL,
+        DMerc_times_r2 REAL
+    );
+    """)
+
+    # Insert data from CSV into the table
+    df.to_sql(table_name, conn, if_exists="append", index=False)
+
+
+def create_indexes(conn):
+    # B-tree indexes for the range queries built in config_query.py
+    for column in INDEXED_FIELDS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{column} ON {table_name} ({column})")
+    conn.execute(f"ANALYZE {table_name}")
+
+
+def create_stats(conn):
+    """
+    Precompute min/max, quantiles and a histogram per searchable column so
+    /api/ranges never scans the table.
+    """
+    df = pd.read_sql(f"SELECT {', '.join(SEARCH_FIELDS)} FROM {table_name}", conn)
+    conn.execute(f"DROP TABLE IF EXISTS {stats_table_name}")
+    conn.execute(f"""
+    CREATE TABLE {stats_table_name} (
+        column_name TEXT PRIMARY KEY,
+        count INTEGER,
+        min REAL,
+        max REAL,
+        quantiles TEXT,
+        histogram TEXT
+    );
+    """)
+    for column in SEARCH_FIELDS:
+        values = df[column].dropna().to_numpy(dtype=float)
+        if len(values) == 0:
+            conn.execute(f"INSERT INTO {stats_table_name} (column_name, count) VALUES (?, 0)", (column,))
+            continue
+        counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+        conn.execute(
+            f"INSERT INTO {stats_table_name} VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                column,
+                len(values),
+                float(values.min()),
+                float(values.max()),
+                json.dumps(dict(zip(map(str, QUANTILES), np.quantile(values, QUANTILES).tolist()))),
+                json.dumps({"edges": edges.tolist(), "counts": counts.tolist()}),
+            ),
+        )
+
+
+def create_sample_ranks(conn):
+    """
+    Store a random permutation rank within each nfp group (sample_rank), so
+    /api/scatter reads a reproducible random sample as an index range
+    instead of sorting by RANDOM().
+    """
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+    if "sample_rank" not in columns:
+        conn.execute(f"ALTER TABLE {table_name} ADD COLUMN sample_rank INTEGER")
+    rng = np.random.default_rng(SAMPLE_SEED)
+    rows = conn.execute(f"SELECT id, nfp FROM {table_name} ORDER BY id").fetchall()
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    nfps = np.array([-1 if row[1] is None else row[1] for row in rows])
+    updates = []
+    for nfp in np.unique(nfps):
+        group = ids[nfps == nfp]
+        ranks = rng.permutation(len(group))
+        updates.extend(zip(ranks.tolist(), group.tolist()))
+    conn.executemany(f"UPDATE {table_name} SET sample_rank = ? WHERE id = ?", updates)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_nfp_sample_rank ON {table_name} (nfp, sample_rank)")
+
+
+if __name__ == "__main__":
+    # Connect to SQLite database (creates it if it doesn't exist)
+    conn = sqlite3.connect(db_file)
+
+    # --metadata-only (or the older --indexes-only) adds the indexes and
+    # statistics to an existing database without reloading the CSV
+    if not {"--metadata-only", "--indexes-only"} & set(sys.argv[1:]):
+        # Load CSV into a DataFrame
+        df = pd.read_csv(csv_file)
+        create_table(conn, df)
+    create_sample_ranks(conn)
+    create_indexes(conn)
+    create_stats(conn)
+
+    # Commit and close
+    conn.commit()
+    conn.close()
 
-# Load CSV into a DataFrame
-df = pd.read_csv(csv_file)
-
-# Connect to SQLite database (creates it if it doesn't exist)
-conn = sqlite3.connect(db_file)
-cursor = conn.cursor()
-
-cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
-
-# Recreate the table with AUTOINCREMENT on id
-cursor.execute(f"""
-CREATE TABLE {table_name} (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    rc1 REAL,
-    rc2 REAL,
-    rc3 REAL,
-    zs1 REAL,
-    zs2 REAL,
-    zs3 REAL,
-    nfp INTEGER,
-    etabar REAL,
-    B2c REAL,
-    p2 REAL,
-    axis_length REAL,
-    iota REAL,
-    max_elongation REAL,
-    min_L_grad_B REAL,
-    min_R0 REAL,
-    r_singularity REAL,
-    L_grad_grad_B REAL,
-    B20_variation REAL,
-    beta REAL,
-    DMerc_times_r2 REAL
-);
-""")
-
-# Insert data from CSV into the table
-df.to_sql(table_name, conn, if_exists="append", index=False)
-
-# Commit and close
-conn.commit()
-conn.close()
-
-print(f"Database '{db_file}' created successfully with table '{table_name}'")
+    print(f"Database '{db_file}' created successfully with table '{table_name}'")
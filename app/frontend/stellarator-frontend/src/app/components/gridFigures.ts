@@ -0,0 +1,48 @@
+// Builds the diagnostic figures from /api/grid?format=series. The server
+// sends one shared phi array and the raw diagnostic arrays as Plotly typed
+// arrays ({dtype, bdata}), which plotly.js decodes natively; this adds the
+// same layout the default format returns, keyed by diagnostic name, in
+// display order.
+
+export type TypedArraySpec = { dtype: string; bdata: string };
+
+export interface GridSeries {
+  phi: TypedArraySpec;
+  series: Record<string, TypedArraySpec>;
+  nonnegative: string[];
+}
+
+// The parts of Plotly's "plotly_white" template these figures rely on
+const AXIS = {
+  gridcolor: "#EBF0F8",
+  linecolor: "#EBF0F8",
+  zerolinecolor: "#EBF0F8",
+  zerolinewidth: 2,
+  automargin: true,
+};
+
+export function gridFigures(data: GridSeries): Record<string, any> {
+  const nonnegative = new Set(data.nonnegative);
+  const figures: Record<string, any> = {};
+  for (const [name, values] of Object.entries(data.series)) {
+    figures[name] = {
+      data: [{ type: "scatter", x: data.phi, y: values, mode: "lines", name }],
+      layout: {
+        title: { text: `${name} vs φ`, x: 0.05 },
+        xaxis: { ...AXIS, title: { text: "φ" } },
+        yaxis: {
+          ...AXIS,
+          title: { text: name },
+          ...(nonnegative.has(name) ? { rangemode: "nonnegative" } : {}),
+        },
+        height: 500,
+        width: 700,
+        paper_bgcolor: "white",
+        plot_bgcolor: "white",
+        font: { color: "#2a3f5f" },
+        hovermode: "closest",
+      },
+    };
+  }
+  return figures;
+}
@@ -4,6 +4,7 @@ import React, { useEffect, useState, useRef } from "react";
 import axios from "axios";
 import dynamic from "next/dynamic";
 import Link from "next/link";
+import { gridFigures } from "./gridFigures";
 
 interface Camera {
   eye: { x: number; y: number; z: number };
@@ -82,7 +83,11 @@ export default function PlotView({ configId }: PlotViewProps) {
 
       // Set up API requests
       const boundaryRequest = axios.get(`${process.env.NEXT_PUBLIC_API_URL}/plot/${configId}`);
-      const gridRequest = axios.get(`${process.env.NEXT_PUBLIC_API_URL}/grid/${configId}`);
+      // Raw diagnostic series (about 20x smaller than the Plotly figures);
+      // the default format is only needed for its static fallback image
+      const gridRequest = axios
+        .get(`${process.env.NEXT_PUBLIC_API_URL}/grid/${configId}?format=series`)
+        .then((response) => response.data.series ? response : axios.get(`${process.env.NEXT_PUBLIC_API_URL}/grid/${configId}`));
       const configRequest = axios.get(`${process.env.NEXT_PUBLIC_API_URL}/download/${configId}?format=json`);
       
       // Execute all requests in parallel
@@ -104,7 +109,15 @@ export default function PlotView({ configId }: PlotViewProps) {
           
           // Process individual diagnostic plots
           setGridPlotData(gridResponse.data.plot_data);
-          if (gridResponse.data.interactive_data) {
+          if (gridResponse.data.series) {
+            const plots = gridFigures(gridResponse.data);
+            const plotNames = Object.keys(plots);
+            setIndividualPlots(plots);
+            setAvailablePlots(plotNames);
+            if (plotNames.length > 0) {
+              setSelectedPlot(plotNames[0]);
+            }
+          } else if (gridResponse.data.interactive_data) {
             try {
               // Process all the individual plots
               const plots: Record<string, any> = {};
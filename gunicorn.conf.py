@@ -0,0 +1,9 @@
+# Read by gunicorn when started from this directory
+# (gunicorn app.backend.routes:app)
+
+
+def post_worker_init(worker):
+    # Warm-up runs once per worker after the app is loaded, not on import
+    from app.backend.routes import start_worker
+
+    start_worker()
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# Small enough to build in a few seconds, large enough for several pages
+ROWS = 300
+
+
+@pytest.fixture(scope="session")
+def database(tmp_path_factory):
+    """A synthetic XGStels.db; about half of the rows have B2c NULL"""
+    import benchmark
+
+    path = str(tmp_path_factory.mktemp("db") / "XGStels.db")
+    benchmark.build_database(path, benchmark.synthetic_rows(ROWS, seed=0, second_order_fraction=0.5))
+    return path
+
+
+@pytest.fixture(scope="session")
+def routes(database, tmp_path_factory):
+    """The backend app against `database`, rendering inline with empty caches"""
+    workdir = tmp_path_factory.mktemp("backend")
+    os.environ.update({
+        "STELLARATOR_DB": database,
+        "STELLARATOR_CACHE_DIR": str(workdir / "cache"),
+        "STELLARATOR_PRECOMPUTED_DIR": str(workdir / "precomputed"),
+        "STELLARATOR_SNAPSHOT_DIR": str(workdir / "snapshot"),
+        "STELLARATOR_JAX_CACHE_DIR": "",
+        "STELLARATOR_COMPUTE_POOL": "0",
+        "STELLARATOR_WARMUP": "0",
+    })
+    import routes
+
+    assert routes.column_store is not None
+    return routes
+
+
+@pytest.fixture
+def client(routes):
+    return routes.app.test_client()
+
+
+@pytest.fixture(params=["column_store", "sqlite"])
+def backend(request, routes, monkeypatch):
+    """Run a test once against the column store and once against SQLite only"""
+    if request.param == "sqlite":
+        monkeypatch.setattr(routes, "column_store", None)
+    return request.param
@@ -0,0 +1,59 @@
+import pytest
+
+from config_query import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    id_search_predicate,
+    parse_numeric_search,
+)
+
+
+@pytest.mark.parametrize("text, interval", [
+    ("0.12", (0.12, 0.13, True, False)),
+    ("-0.12", (-0.13, -0.12, False, True)),
+    ("5", (5.0, 6.0, True, False)),
+    ("5.", (5.0, 6.0, True, False)),
+    (".5", (0.5, 0.6, True, False)),
+    (" 0.12 ", (0.12, 0.13, True, False)),
+    ("0.12~0.005", (0.115, 0.125, True, True)),
+    ("0.12~-0.005", (0.115, 0.125, True, True)),
+    ("1e5~2", (99998.0, 100002.0, True, True)),
+])
+def test_numeric_search_bounds(text, interval):
+    assert parse_numeric_search(text) == pytest.approx(interval)
+
+
+@pytest.mark.parametrize("text", [
+    "", "abc", "1.2.3", "--1", "1e5", "²", "0x10",
+    "~", "1~", "~1", "1~abc",
+    "sNaN~1", "1~sNaN", "NaN~1", "inf~1", "Infinity~0",
+    "1e999999999~1", "1e400~1",
+])
+def test_numeric_search_rejects_malformed(text):
+    assert parse_numeric_search(text) is None
+
+
+def test_id_search_prefix_ranges():
+    assert id_search_predicate("12", 1500) == ("any", [
+        ("range", "id", 12, 12, True, True),
+        ("range", "id", 120, 129, True, True),
+        ("range", "id", 1200, 1299, True, True),
+    ])
+    assert id_search_predicate("0", 1500) == ("none",)
+    assert id_search_predicate("9999", 1500) == ("none",)
+
+
+def test_id_search_non_ascii_digits_fall_back_to_like():
+    assert id_search_predicate("²", 1500) == ("like", "id", "²")
+
+
+def test_cursor_round_trip():
+    row = (7, 0.1, 0.0, 0.0, -0.1, 0.0, 0.0, 2, -0.9, None) + (0.0,) * 7
+    assert decode_cursor(encode_cursor("B2c", "desc", row), "B2c", "desc") == (None, 7)
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "e30", encode_cursor("id", "asc", (3,) + (0.0,) * 16)])
+def test_cursor_rejects_garbage_and_other_sorts(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "iota", "asc")
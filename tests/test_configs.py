@@ -0,0 +1,84 @@
+import pytest
+
+from config_query import id_search_predicate, keyset_predicate, search_predicate
+
+SORTS = [("id", "asc"), ("id", "desc"), ("iota", "asc"), ("B2c", "asc"), ("B2c", "desc")]
+
+
+def predicate_sets(routes):
+    """One filter set per predicate kind the column store answers"""
+    return [
+        [],
+        [("range", "iota", 0.2, 0.8, True, True)],
+        [("range", "etabar", None, -0.9, True, False)],
+        [("range", "rc1", 0.05, None, False, True)],
+        [("range", "B2c", -1.0, 1.0, True, True)],
+        [search_predicate("iota", "0.4")],
+        [search_predicate("etabar", "-0.8~0.05")],
+        [id_search_predicate("1", routes.max_config_id())],
+        [("none",)],
+        [("range", "nfp", 2, 3, True, True), search_predicate("iota", "0.3~0.3")],
+        [keyset_predicate("B2c", "asc", None, 150)],
+        [keyset_predicate("B2c", "asc", 0.0, 150)],
+        [keyset_predicate("B2c", "desc", None, 150)],
+        [keyset_predicate("B2c", "desc", 0.0, 150)],
+        [keyset_predicate("id", "desc", None, 100)],
+    ]
+
+
+def test_column_store_matches_sqlite(routes):
+    store = routes.column_store
+    for predicates in predicate_sets(routes):
+        assert store.supports(predicates)
+        for sort_field, sort_order in SORTS:
+            expected = routes.query_configs(predicates, sort_field, sort_order, 0, 10**6)
+            positions = store.select(store.mask(predicates), sort_field, sort_order)
+            assert store.rows(positions) == expected, (predicates, sort_field, sort_order)
+
+
+def test_database_has_null_b2c(routes):
+    values = [row[9] for row in routes.query_configs([], "id", "asc", 0, 10**6)]
+    assert None in values
+    assert any(value is not None for value in values)
+
+
+def fetch(client, **args):
+    response = client.get("/api/configs", query_string=args)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+@pytest.mark.parametrize("sort_field, sort_order", SORTS)
+@pytest.mark.parametrize("filters", [{}, {"iota_min": "0.1", "search_etabar": "-0.8~0.2"}])
+def test_keyset_walk_equals_offset_pages(client, backend, sort_field, sort_order, filters):
+    args = dict(filters, sort_field=sort_field, sort_order=sort_order, limit=7)
+    first = fetch(client, page=1, **args)
+    offset_rows = first["configs"]
+    for page in range(2, first["totalPages"] + 1):
+        offset_rows += fetch(client, page=page, **args)["configs"]
+    assert len(offset_rows) == first["count"]
+
+    cursor_rows = []
+    body = fetch(client, pagination="cursor", **args)
+    while True:
+        cursor_rows += body["configs"]
+        if body["next_cursor"] is None:
+            break
+        body = fetch(client, cursor=body["next_cursor"], **args)
+    assert cursor_rows == offset_rows
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/configs", query_string={"cursor": "garbage", "sort_field": "iota"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("query", [
+    {"search_iota": "sNaN~1"},
+    {"search_iota": "1e999999999~1"},
+    {"search_id": "²"},
+])
+def test_malformed_searches_match_nothing(client, backend, query):
+    body = fetch(client, **query)
+    assert body["count"] == 0
+    assert body["configs"] == []
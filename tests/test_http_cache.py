@@ -0,0 +1,34 @@
+import pytest
+
+
+def revalidate(client, path, etag, weak):
+    value = f'W/"{etag}"' if weak else f'"{etag}"'
+    return client.get(path, headers={"If-None-Match": value})
+
+
+@pytest.mark.parametrize("path", ["/api/configs?sort_field=iota&limit=5", "/api/ranges", "/api/plot/1"])
+@pytest.mark.parametrize("weak", [True, False])
+def test_matching_etag_gives_304(client, path, weak):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag, is_weak = response.get_etag()
+    assert is_weak
+
+    revalidated = revalidate(client, path, etag, weak)
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b""
+    # The same validator on the 304 as on the 200
+    assert revalidated.get_etag() == (etag, True)
+
+
+def test_compressed_and_identity_responses_share_the_etag(client):
+    path = "/api/configs?limit=200"
+    identity = client.get(path)
+    compressed = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers.get("Content-Encoding") == "gzip"
+    assert compressed.get_etag() == identity.get_etag()
+
+
+def test_other_etag_gives_200(client):
+    response = revalidate(client, "/api/configs?limit=5", "0" * 64, weak=True)
+    assert response.status_code == 200